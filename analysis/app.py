@@ -1,16 +1,19 @@
 import streamlit as st
+import base64
 import json
 import os
 import sys
+import sqlite3
 import subprocess
+from concurrent.futures import as_completed
+from datetime import datetime
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.stream_sampler import extract_frames
-from src.vision_analyzer import analyze_frame
 from src.config import MODEL
+from src.result_store import ResultStore
 
 st.set_page_config(page_title="Factory AI Observer", layout="wide")
 st.title("Egocentric-10K Mini Explorer")
@@ -19,6 +22,106 @@ st.caption("GPT-4o-mini vision analysis of factory worker videos")
 # Load from local preloaded clips (in parent directory)
 CLIPS_DIR = Path(__file__).parent.parent / "sample_clips"
 TEST_CLIP = "clip_00.mp4"  # 7-minute video
+FIRST_30 = "First 30 seconds (3 frames, recommended)"
+FULL_VIDEO = "Full video (7 minutes, ~40 frames)"
+
+
+@st.cache_resource
+def get_engine():
+    """One engine (thread pool, rate limiter, response cache) shared by every session."""
+    # Imported here so the first page render does not wait for the OpenAI SDK
+    from src.analysis_engine import AnalysisEngine
+    from src.response_cache import ResponseCache
+    return AnalysisEngine(cache=ResponseCache())
+
+
+@st.cache_resource
+def get_store():
+    from src.frame_store import FrameStore
+    return FrameStore()
+
+
+@st.cache_resource
+def get_result_store():
+    return ResultStore()
+
+
+@st.cache_data(show_spinner=False)
+def load_metadata(metadata_path, mtime):
+    with open(metadata_path, "r") as f:
+        return json.load(f)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_frames(video_path, mtime, analysis_option):
+    """Sampled frames as `(sec, b64_jpeg)`, decoded once per clip version and option."""
+    from src.stream_sampler import extract_frames
+    from src.vision_analyzer import encode_frame
+
+    if analysis_option == FIRST_30:
+        # Extract 3 frames from first 30 seconds: at 5s, 15s, and 25s
+        frames = extract_frames(video_path, timestamps=[5, 15, 25], store=get_store())
+    else:
+        # Extract frames from full 7-minute video at 10-second intervals
+        frames = extract_frames(video_path, interval_sec=10, max_frames=None, store=get_store())
+    return [(sec, encode_frame(frame)) for sec, frame in frames]
+
+
+def render_result(slot, future):
+    with slot.container():
+        try:
+            result = future.result()
+        except Exception as e:
+            st.error(f"Analysis failed: {e}")
+            return
+        st.markdown(f"**Analysis:** {result['description']}")
+        cached = " • cached" if result["cached"] else ""
+        st.caption(f"Cost: ~${result['cost_usd']:.4f} • {result['input_tokens']} input / {result['output_tokens']} output tokens{cached}")
+
+def browse_results():
+    """Past runs from the result store, filtered and searched without re-analysing."""
+    result_store = get_result_store()
+    runs = result_store.runs()
+    if not runs:
+        st.info("No stored results yet. Run an analysis (or `python main.py`) first.")
+        return
+    run_labels = {"All runs": None}
+    for run in runs:
+        started = datetime.fromtimestamp(run["started"]).strftime("%Y-%m-%d %H:%M")
+        run_labels[f"#{run['id']} • {started} • {run['source']} • {run['clips']} clip(s) • ${run['cost_usd']:.4f}"] = run["id"]
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        run_id = run_labels[st.selectbox("Run", list(run_labels))]
+        text = st.text_input("Search analyses", placeholder="e.g. gloves, forklift OR ladder, weld*")
+    with col2:
+        factory_id = st.text_input("Factory ID")
+    with col3:
+        worker_id = st.text_input("Worker ID")
+    try:
+        frames = result_store.query(
+            text=text.strip() or None,
+            run_id=run_id,
+            factory_id=int(factory_id) if factory_id.strip() else None,
+            worker_id=int(worker_id) if worker_id.strip() else None,
+            limit=500,
+        )
+    except ValueError:
+        st.error("Factory and worker IDs must be numbers.")
+        return
+    except sqlite3.OperationalError as e:
+        st.error(f"Invalid search: {e}")
+        return
+    st.caption(f"{len(frames)} frame(s){' (first 500)' if len(frames) == 500 else ''}")
+    st.dataframe(
+        [{k: frame[k] for k in ("run_id", "clip", "factory_id", "worker_id", "sec", "analysis", "error")} for frame in frames],
+        use_container_width=True,
+    )
+
+
+if st.sidebar.radio("Mode", ["Analyze clip", "Browse past results"]) == "Browse past results":
+    browse_results()
+    st.stop()
 
 # Check if clip 00 exists
 clip_path = CLIPS_DIR / TEST_CLIP
@@ -53,71 +156,92 @@ st.success("✅ Clip 00 is ready!")
 # Analysis options
 analysis_option = st.radio(
     "Choose what to analyze:",
-    ["First 30 seconds (3 frames, recommended)", "Full video (7 minutes, ~40 frames)"],
+    [FIRST_30, FULL_VIDEO],
     help="Start with 30 seconds to test the analysis before running on the full video"
 )
 
 if st.button("Analyze"):
     metadata_path = clip_path.with_suffix('.json')
-
     with st.spinner("Loading clip..."):
-        # Load video and metadata
-        with open(clip_path, "rb") as f:
-            video_bytes = f.read()
-        with open(metadata_path, "r") as f:
-            metadata = json.load(f)
-
-        # Extract frames based on selection
-        if "First 30" in analysis_option:
-            # Extract 3 frames from first 30 seconds: at 5s, 15s, and 25s
-            frames = extract_frames(video_bytes, interval_sec=10, max_frames=3)
-            st.info(f"📹 Analyzing clip_00.mp4 • First 30 seconds • 3 frames")
-        else:
-            # Extract frames from full 7-minute video at 10-second intervals
-            frames = extract_frames(video_bytes, interval_sec=10, max_frames=None)
-            st.info(f"📹 Analyzing clip_00.mp4 • Full 7 minutes • {len(frames)} frames")
-
-        # Analyze each frame
-        total_cost = 0
-        results = []
-
-        for i, frame in enumerate(frames):
-            frame_time = (i + 1) * 10 - 5  # Approximate time in seconds
-
-            col1, col2 = st.columns([1, 1])
-            with col1:
-                st.image(frame, use_column_width=True)
-                st.caption(f"Frame {i+1}/{len(frames)} • ~{frame_time}s • Worker {metadata.get('worker_id', 'N/A')} • Factory {metadata.get('factory_id', 'N/A')}")
-
-            with col2:
-                with st.spinner(f"Analyzing frame {i+1}..."):
-                    result = analyze_frame(frame)
-                    st.markdown(f"**Analysis:** {result['description']}")
-                    st.caption(f"Cost: ~${result['cost_usd']:.4f} • {result['input_tokens']} input / {result['output_tokens']} output tokens")
-                    total_cost += result['cost_usd']
-                    results.append({
-                        "frame": i + 1,
-                        "time_sec": frame_time,
-                        "analysis": result["description"],
-                        "cost_usd": result["cost_usd"]
-                    })
-
-            st.divider()
-
-        # Show total cost
-        st.success(f"✅ Analysis complete! Total cost: ~${total_cost:.4f}")
-
-        # Save button
-        if st.button("Save Results to JSON"):
-            output = {
-                "worker_id": metadata['worker_id'],
-                "factory_id": metadata['factory_id'],
-                "analysis_type": analysis_option,
-                "total_frames": len(frames),
-                "total_cost_usd": total_cost,
-                "model": MODEL,
-                "results": results
-            }
-            with open("egocentric_analysis.json", "w") as f:
-                json.dump(output, f, indent=2)
-            st.success("Saved to egocentric_analysis.json!")
+        metadata = load_metadata(str(metadata_path), metadata_path.stat().st_mtime)
+        frames = load_frames(str(clip_path), clip_path.stat().st_mtime, analysis_option)
+
+    # Submit every frame at once; futures live in session_state, so a rerun
+    # (e.g. the save button) redraws finished results instead of re-analysing.
+    st.session_state["run"] = {
+        "analysis_option": analysis_option,
+        "metadata": metadata,
+        "frames": frames,
+        "futures": get_engine().submit_many([b64 for _, b64 in frames], encoded=True),
+    }
+
+run = st.session_state.get("run")
+if run is not None:
+    frames, futures, metadata = run["frames"], run["futures"], run["metadata"]
+    label = "First 30 seconds" if run["analysis_option"] == FIRST_30 else "Full 7 minutes"
+    st.info(f"📹 Analyzing clip_00.mp4 • {label} • {len(frames)} frames")
+
+    # Lay out every frame first, then fill in analyses as they complete
+    slots = []
+    for i, (frame_time, b64) in enumerate(frames):
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            st.image(base64.b64decode(b64), use_column_width=True)
+            st.caption(f"Frame {i+1}/{len(frames)} • {frame_time:.1f}s • Worker {metadata.get('worker_id', 'N/A')} • Factory {metadata.get('factory_id', 'N/A')}")
+        with col2:
+            slots.append(st.empty())
+            if not futures[i].done():
+                slots[i].caption(f"Analyzing frame {i+1}...")
+        st.divider()
+
+    slot_of = {future: slot for future, slot in zip(futures, slots)}
+    for future in futures:
+        if future.done():
+            render_result(slot_of[future], future)
+    with st.spinner("Analyzing frames..."):
+        for future in as_completed([f for f in futures if not f.done()]):
+            render_result(slot_of[future], future)
+
+    results = []
+    for i, ((frame_time, _), future) in enumerate(zip(frames, futures)):
+        if future.exception() is None:
+            result = future.result()
+            results.append({
+                "frame": i + 1,
+                "time_sec": frame_time,
+                "analysis": result["description"],
+                "cost_usd": result["cost_usd"],
+                "cached": result["cached"]
+            })
+    total_cost = sum(r["cost_usd"] for r in results)
+    hit_rate = sum(r["cached"] for r in results) / len(results) if results else 0.0
+
+    # Show total cost
+    st.success(f"✅ Analysis complete! Total cost: ~${total_cost:.4f} • Cache hit rate: {hit_rate:.0%}")
+
+    # Save appends this analysis to the result store as a new run;
+    # nothing earlier is overwritten.
+    if st.button("Save Results"):
+        result_store = get_result_store()
+        run_id = result_store.start_run("app", analysis_type=run["analysis_option"], model=MODEL)
+        result_store.add_clip(run_id, {
+            "key": clip_path.stem,
+            "factory_id": metadata['factory_id'],
+            "worker_id": metadata['worker_id'],
+            "duration_sec": metadata.get('duration_sec'),
+            "cost_usd": total_cost,
+            "frames": [{"frame_idx": r["frame"] - 1, "sec": r["time_sec"], "analysis": r["analysis"]} for r in results]
+        })
+        st.success(f"Saved as run #{run_id} — see Browse past results.")
+
+    output = {
+        "worker_id": metadata['worker_id'],
+        "factory_id": metadata['factory_id'],
+        "analysis_type": run["analysis_option"],
+        "total_frames": len(frames),
+        "total_cost_usd": total_cost,
+        "model": MODEL,
+        "results": results
+    }
+    st.download_button("Download JSON", json.dumps(output, indent=2), file_name="egocentric_analysis.json",
+                       mime="application/json")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Analyze a live egocentric feed (RTSP/HTTP URL) or replay a local clip in real time."""
+import argparse
+import signal
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.analysis_engine import AnalysisEngine
+from src.live_feed import LiveFeed
+from src.results_log import ResultsLog
+from src.metrics import metrics
+from src.config import LIVE_SAMPLE_FPS, LIVE_RING_SIZE, LIVE_MAX_IN_FLIGHT
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze a live video feed, always sending the freshest frame.")
+    parser.add_argument("source", help="rtsp://, http(s):// stream URL, or a local video file")
+    parser.add_argument("--output", default="egocentric_live.jsonl",
+                        help="JSONL log, one line per decision (default: %(default)s)")
+    parser.add_argument("--duration", type=float, metavar="SEC",
+                        help="stop after this many seconds (default: until the feed ends or Ctrl-C)")
+    parser.add_argument("--fps", type=float, default=LIVE_SAMPLE_FPS,
+                        help="candidate frames kept per second of video (default: %(default)s)")
+    parser.add_argument("--ring", type=int, default=LIVE_RING_SIZE,
+                        help="candidate frames buffered before the oldest is dropped (default: %(default)s)")
+    parser.add_argument("--in-flight", type=int, default=LIVE_MAX_IN_FLIGHT,
+                        help="concurrent analysis requests (default: %(default)s)")
+    parser.add_argument("--realtime", action=argparse.BooleanOptionalAction,
+                        help="pace decoding to the video timestamps (default: on for local files)")
+    parser.add_argument("--rtsp-tcp", action="store_true",
+                        help="use TCP for RTSP (more robust through NAT and over lossy links)")
+    parser.add_argument("--metrics", metavar="PATH", default="egocentric_live_metrics.json",
+                        help="per-stage timings, counters and latency histograms as JSON (default: %(default)s)")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="also write metrics in Prometheus textfile format, e.g. for node-exporter")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    options = {"rtsp_transport": "tcp"} if args.rtsp_tcp else None
+
+    with AnalysisEngine(concurrency=args.in_flight) as engine, ResultsLog(args.output) as log:
+        feed = LiveFeed(args.source, engine, sample_fps=args.fps, ring_size=args.ring,
+                        max_in_flight=args.in_flight, realtime=args.realtime, options=options)
+        signal.signal(signal.SIGINT, lambda *_: feed.stop())
+
+        def on_decision(decision):
+            log.write(decision)
+            stats = feed.stats()
+            text = decision.get("analysis") or f"ERROR: {decision['error']}"
+            print(f"[{decision['sec']:8.1f}s] latency {decision['latency_sec']:.2f}s, lag {decision['lag_sec']:.2f}s, "
+                  f"{stats['analysis_rate']:.2f}/s, {stats['dropped']} dropped | {text}")
+
+        print(f"Analyzing {args.source} ({'real-time replay' if feed.realtime else 'live'}); Ctrl-C to stop")
+        stats = feed.run(on_decision, duration=args.duration)
+
+    if feed.capture_error is not None:
+        print(f"\nFeed error: {feed.capture_error}")
+    print(f"\nDone! {stats['analyzed']} decision(s) in {stats['elapsed_sec']:.1f}s "
+          f"({stats['analysis_rate']}/s), {stats['errors']} error(s)")
+    print(f"Frames: {stats['frames_decoded']} decoded, {stats['frames_sampled']} sampled, {stats['dropped']} dropped as stale")
+    print(f"Latency: {stats['mean_latency_sec']}s mean; lag behind the feed: {stats['lag_sec']}s last, "
+          f"{stats['max_lag_sec']}s worst")
+    print(f"Decisions saved to {args.output}")
+    metrics.write_json(args.metrics)
+    print(f"Metrics saved to {args.metrics}")
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,550 @@
 #!/usr/bin/env python3
-import json
-import time
+import argparse
+import os
+import random
 import sys
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import ExitStack
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.stream_sampler import stream_random_clips, extract_frames
-from src.vision_analyzer import analyze_frame
-from src.config import MAX_CLIPS, FRAMES_PER_CLIP
+# Decoding, the API client and the optional modes are imported where they
+# are used, so `--help` and argument errors come back instantly.
+from src.stream_sampler import stream_random_clips, local_clips, sample_key, prefetch
+from src.response_cache import ResponseCache, cache_key
+from src.results_log import ResultsLog, read_log, compact
+from src.result_store import ResultStore
+from src.catalogue import STRATA
+from src.metrics import metrics
+from src.config import MAX_CLIPS, FRAMES_PER_CLIP, MAX_CONCURRENCY, QUEUE_POLL_SEC, RESULT_STORE_PATH
 from tqdm import tqdm
 
-def main():
-    print("Streaming random factory clips from Egocentric-10K...")
-    clips = stream_random_clips(MAX_CLIPS)
-    
-    results = []
+MAX_PENDING_CLIPS = 2 * MAX_CONCURRENCY  # clips decoded but not yet written out
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze random Egocentric-10K clips with the vision model.")
+    parser.add_argument("--output", default="egocentric_analysis.jsonl",
+                        help="JSONL results log, one line per clip (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the run in --output, skipping clips already analyzed")
+    parser.add_argument("--local", metavar="DIR",
+                        help="analyze clips saved by the preload scripts instead of streaming")
+    parser.add_argument("--stream", action="store_true",
+                        help="sample by streaming the dataset even when the clip catalogue is built")
+    parser.add_argument("--stratify", choices=sorted(STRATA),
+                        help="spread the catalogue sample evenly over factories or workers")
+    parser.add_argument("--max-clips", type=int, default=MAX_CLIPS,
+                        help="number of clips to analyze (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the response cache and decoded-frame store")
+    parser.add_argument("--batch", action="store_true",
+                        help="send frames through the OpenAI Batch API (half price, results within 24h)")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="share the run through a SQLite job queue at PATH (with --enqueue and/or --worker)")
+    parser.add_argument("--enqueue", metavar="SOURCE", nargs="+",
+                        help="coordinator: queue the clips of these tar shard URLs or local clip directories, "
+                             "or 'catalogue' for a random catalogue sample")
+    parser.add_argument("--worker", action="store_true",
+                        help="worker: claim and analyze queued clips until the queue is drained")
+    parser.add_argument("--store", metavar="PATH", default=RESULT_STORE_PATH,
+                        help="SQLite result store that every run is appended to (default: %(default)s)")
+    parser.add_argument("--metrics", metavar="PATH", default="egocentric_metrics.json",
+                        help="per-stage timings, counters and token/cost totals as JSON (default: %(default)s)")
+    parser.add_argument("--prometheus", metavar="PATH",
+                        help="also write metrics in Prometheus textfile format, e.g. for node-exporter")
+    return parser.parse_args()
+
+def finish_clip(clip_result, entries):
+    """Wait for a clip's frames and return its result record and new cost."""
+    cost = 0
+    for ref, future, deduped_from in entries:
+        try:
+            analysis = future.result()
+            frame_result = {
+                "frame_idx": ref["frame_idx"],
+                "sec": ref["sec"],
+                "analysis": analysis["description"]
+            }
+            if deduped_from is None:
+                cost += analysis["cost_usd"]
+            else:
+                frame_result["deduped_from"] = deduped_from
+            clip_result["frames"].append(frame_result)
+        except Exception as e:
+            clip_result["frames"].append({"error": str(e)})
+    clip_result["cost_usd"] = round(cost, 7)
+    return clip_result, cost
+
+def new_record(clip):
+    meta = clip['json']
+    return {
+        "type": "clip",
+        "key": sample_key(clip),
+        "factory_id": meta['factory_id'],
+        "worker_id": meta['worker_id'],
+        "duration_sec": meta['duration_sec'],
+        "frames": []
+    }
+
+def frame_refs(clip_result, frames, deduper):
+    """Refs for a clip's decoded frames and their near-duplicate matches."""
+    key = clip_result["key"]
+    refs = [{"clip": key, "frame_idx": i, "sec": round(sec, 3)} for i, (sec, _, _) in enumerate(frames)]
+    matches = deduper.dedupe_hashes([h for _, _, h in frames], refs, factory_id=clip_result["factory_id"])
+    return refs, matches
+
+def prepare_batch(output, decoded, total, cache, deduper):
+    """Write every new frame into Batch API input files.
+
+    Returns the batch plan logged as a "batch" record: input files, cached
+    results, cache keys and, per clip, each frame's ref, the custom_id
+    that answers it, and what it was deduplicated from. `submit_batches`
+    then fills in the batch ids.
+    """
+    from src.batch_runner import BatchWriter
+    from src.vision_analyzer import DEFAULT_PROMPT
+
+    plan = {"type": "batch", "paths": [], "submitted": [], "batch_ids": [], "results": {}, "keys": {}, "clips": []}
+    deduped = 0
+    with BatchWriter(str(Path(output).with_suffix(".batch"))) as writer:
+        for clip, frames in tqdm(decoded, total=total, desc="Preparing batch"):
+            clip_result = new_record(clip)
+            refs, matches = frame_refs(clip_result, frames, deduper)
+            entries = []
+            for ref, (_, b64, _), match in zip(refs, frames, matches):
+                if match is None:
+                    custom_id = f"{ref['clip']}/{ref['frame_idx']}"
+                    key = cache_key(b64, DEFAULT_PROMPT) if cache is not None else None
+                    hit = cache.get(key) if key else None
+                    if hit is not None:
+                        plan["results"][custom_id] = hit
+                    else:
+                        writer.add(custom_id, b64)
+                        if key:
+                            plan["keys"][custom_id] = key
+                    entries.append([ref, custom_id, None])
+                else:
+                    original, distance = match
+                    deduped += 1
+                    entries.append([ref, f"{original['clip']}/{original['frame_idx']}", dict(original, hamming=distance)])
+            plan["clips"].append({"record": clip_result, "frames": entries})
+    plan["paths"] = writer.paths
+    return plan, deduped
+
+def submit_batches(plan, log):
+    """Submit the plan's input files that are not submitted yet.
+
+    Each batch id is logged (and fsynced) as soon as the batch exists, so
+    a crash part-way through never loses, and `--resume` never pays
+    again for, a batch that was already submitted.
+    """
+    from src.batch_runner import submit
+
+    for path in plan.get("paths", []):
+        if path in plan["submitted"]:
+            continue
+        if not os.path.exists(path):
+            print(f"Batch input {path} is missing; its frames are retried synchronously")
+            continue
+        batch_id = submit(path)
+        log.write({"type": "batch_submitted", "path": path, "batch_id": batch_id})
+        log.checkpoint()
+        plan["submitted"].append(path)
+        plan["batch_ids"].append(batch_id)
+        print(f"Submitted batch {batch_id} ({path})")
+
+def retry_frames(custom_ids, paths, cache):
+    """Results for the frames of `custom_ids`, read back from the batch input files and sent synchronously."""
+    from src.analysis_engine import AnalysisEngine
+    from src.batch_runner import read_requests
+
+    requests = [request for path in paths if os.path.exists(path) for request in read_requests(path, custom_ids)]
+    if not requests:
+        return {}
+    print(f"Retrying {len(requests)} frame(s) the batch did not answer with synchronous requests")
+    metrics.inc("batch_frames_retried", len(requests))
+    results = {}
+    with AnalysisEngine(cache=cache) as engine:
+        futures = engine.submit_many([b64 for _, b64 in requests], encoded=True)
+        for (custom_id, _), future in zip(requests, futures):
+            error = future.exception()
+            results[custom_id] = future.result() if error is None else error
+    return results
+
+def collect_batch(plan, log, cache, done):
+    """Wait for the plan's batches and write a record for every clip not in `done`.
+
+    Frames whose batch request failed, or that no batch answered, are
+    retried with synchronous requests before their clips are written.
+    """
+    from src.batch_runner import BatchError, wait, iter_results
+
+    def report(batch):
+        counts = batch.request_counts
+        progress = f" {counts.completed + counts.failed}/{counts.total}" if counts else ""
+        print(f"Batch {batch.id}: {batch.status}{progress}")
+
+    results = dict(plan["results"])
+    for batch_id in plan["batch_ids"]:
+        batch = wait(batch_id, on_poll=report)
+        report(batch)
+        for custom_id, result in iter_results(batch):
+            results[custom_id] = result
+            key = plan["keys"].get(custom_id)
+            if key and cache is not None and not isinstance(result, Exception):
+                cache.put(key, result)
+
+    # Frames the batch failed or never ran get a second chance outside it
+    failed = {custom_id for clip in plan["clips"] if clip["record"]["key"] not in done
+              for _, custom_id, _ in clip["frames"]
+              if custom_id not in results or isinstance(results[custom_id], Exception)}
+    if failed:
+        results.update(retry_frames(failed, plan.get("paths", []), cache))
+
+    analyzed = 0
     total_cost = 0
+    for clip in plan["clips"]:
+        if clip["record"]["key"] in done:
+            continue
+        entries = []
+        for ref, custom_id, deduped_from in clip["frames"]:
+            future = Future()
+            result = results.get(custom_id, BatchError(f"no result for {custom_id} in the batch output"))
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+            entries.append((ref, future, deduped_from))
+        record, cost = finish_clip(dict(clip["record"], frames=[]), entries)
+        log.write(record)
+        analyzed += 1
+        total_cost += cost
+    # Kept until now for the retries above
+    for path in plan.get("paths", []):
+        if os.path.exists(path):
+            os.remove(path)
+    return analyzed, total_cost
+
+def run_sync(clips, log, cache, store, deduper, total, on_error=None, decoder=None, submitted=None):
+    """Analyze clips with synchronous API calls, writing each clip's record as it completes.
+
+    `on_error(clip, error)` is called for clips that cannot be decoded,
+    which are then skipped; without it, the first such clip ends the run.
+    A caller that runs several rounds with the same `deduper` passes its
+    own `decoder` (DecodePool) and `submitted` dict, so frames matched
+    against an earlier round still find that round's results.
+    """
+    from src.decode_pool import DecodePool
+    from src.analysis_engine import AnalysisEngine
+
+    analyzed = 0
+    total_cost = 0
+    deduped = 0
+    with ExitStack() as stack:
+        if decoder is None:
+            decoder = stack.enter_context(DecodePool())
+        engine = stack.enter_context(AnalysisEngine(cache=cache))
+        # Clips are decoded and JPEG-encoded in worker processes; every frame
+        # is submitted as soon as it comes back, and the engine keeps
+        # MAX_CONCURRENCY requests in flight within the account rate limits.
+        # Near-identical frames reuse the result of the frame they match.
+        # Finished clips are written out in order as soon as they complete.
+        pending = deque()
+        if submitted is None:
+            submitted = {}
+        decoded = decoder.imap(clips, on_error=on_error, interval_sec=10, max_frames=FRAMES_PER_CLIP, store=store)
+        for clip, frames in tqdm(decoded, total=total, desc="Analyzing clips"):
+            clip_result = new_record(clip)
+            refs, matches = frame_refs(clip_result, frames, deduper)
+
+            new_frames = [b64 for (_, b64, _), match in zip(frames, matches) if match is None]
+            new_futures = iter(engine.submit_many(new_frames, encoded=True))
+
+            if not deduper.cross_clip:
+                submitted.clear()
+            entries = []
+            for ref, match in zip(refs, matches):
+                if match is None:
+                    future = next(new_futures)
+                    submitted[(ref["clip"], ref["frame_idx"])] = future
+                    entries.append((ref, future, None))
+                else:
+                    original, distance = match
+                    deduped += 1
+                    future = submitted[(original["clip"], original["frame_idx"])]
+                    entries.append((ref, future, dict(original, hamming=distance)))
+            pending.append((clip_result, entries))
+
+            while pending and (len(pending) > MAX_PENDING_CLIPS or all(f.done() for _, f, _ in pending[0][1])):
+                record, cost = finish_clip(*pending.popleft())
+                log.write(record)
+                analyzed += 1
+                total_cost += cost
+
+        while pending:
+            record, cost = finish_clip(*pending.popleft())
+            log.write(record)
+            analyzed += 1
+            total_cost += cost
+    return analyzed, total_cost, deduped
+
+def queue_jobs(sources, limit, stratify=None):
+    """`(job_id, payload)` for the clips of tar shard URLs, local clip directories
+    or a catalogue sample ("catalogue"), at most `limit`."""
+    from src.catalogue import ready_catalogue
+    from src.shard_index import load_index
+
+    count = 0
+    for source in sources:
+        if source == "catalogue":
+            catalogue = ready_catalogue()
+            if catalogue is None:
+                raise SystemExit("No fully indexed clip catalogue; run `python -m src.catalogue refresh` first.")
+            jobs = ((clip["key"], {"url": clip["url"], "clip": clip})
+                    for clip in catalogue.sample(limit - count, stratify=stratify))
+        elif os.path.isdir(source):
+            jobs = ((clip["__key__"], {"path": clip["mp4"], "json": clip["json"]}) for clip in local_clips(source))
+        else:
+            jobs = ((clip["key"], {"url": source, "clip": clip}) for clip in load_index(source)["clips"])
+        for job in jobs:
+            if count >= limit:
+                return
+            count += 1
+            yield job
+
+def claimed_clips(queue, owner):
+    """Claim queued clips one by one, shaped like dataset samples, until none is claimable.
+
+    A clip that cannot be fetched fails its own job and is skipped.
+    """
+    from src.shard_index import fetch_clip
+
+    while True:
+        job = queue.claim(owner)
+        if job is None:
+            return
+        job_id, payload, _ = job
+        if "path" in payload:
+            yield {"__key__": job_id, "json": payload["json"], "mp4": payload["path"]}
+            continue
+        clip = payload["clip"]
+        try:
+            mp4 = fetch_clip(payload["url"], clip)
+        except Exception as e:
+            print(f"Could not fetch {job_id}: {e}")
+            queue.fail(owner, e, job_id=job_id)
+            continue
+        yield {"__key__": job_id, "json": clip["metadata"], "mp4": mp4}
+
+class QueueSink:
+    """Takes the place of the results log in worker mode: each clip record completes its job."""
+
+    def __init__(self, queue, owner):
+        self.queue = queue
+        self.owner = owner
+        self.analyzed = 0
+        self.cost = 0
+
+    def write(self, record):
+        if self.queue.complete(record["key"], self.owner, record):
+            self.analyzed += 1
+            self.cost += record["cost_usd"]
+
+def run_queue(args, cache, store, deduper):
+    """Coordinator and/or worker side of a --queue run.
+
+    Returns (analyzed, cost, deduped, finished); `finished` means the
+    queue is drained and this process wrote every clip's result to --output.
+    """
+    from src.job_queue import JobQueue, Heartbeat, worker_id
+
+    queue = JobQueue(args.queue)
+    if args.enqueue:
+        added = queue.add(queue_jobs(args.enqueue, args.max_clips, args.stratify))
+        print(f"Queued {added} new clip(s) in {args.queue}: {queue.counts()}")
+
+    owner = worker_id()
+    sink = QueueSink(queue, owner)
+    deduped = 0
+
+    def clip_failed(clip, error):
+        # Only this clip's job goes back to the queue (or fails for good)
+        print(f"Could not decode {sample_key(clip)}: {error}")
+        queue.fail(owner, error, job_id=sample_key(clip))
+
+    if args.worker:
+        from src.decode_pool import DecodePool
+
+        print(f"Worker {owner} claiming clips from {args.queue}...")
+        # One decode pool and one map of analysed frames for the worker's
+        # lifetime, like its deduper: a frame can match one from an earlier round
+        decoder = DecodePool()
+        submitted = {}
+        try:
+            with Heartbeat(queue, owner):
+                while not queue.drained():
+                    try:
+                        deduped += run_sync(prefetch(claimed_clips(queue, owner)), sink, cache, store, deduper, None,
+                                            on_error=clip_failed, decoder=decoder, submitted=submitted)[2]
+                    except Exception as e:
+                        # Only this worker's leases are affected; they go back to the queue
+                        print(f"Worker error, releasing leased clips: {e}")
+                        queue.fail(owner, e)
+                        # Start the next round afresh; the pool may be broken
+                        decoder.close()
+                        decoder = DecodePool()
+                        deduper.reset()
+                        submitted.clear()
+                        continue
+                    if not queue.drained():
+                        # Other workers still hold leases; wait in case one of them dies
+                        time.sleep(QUEUE_POLL_SEC)
+        finally:
+            decoder.close()
+
+    finished = queue.claim_finalize(owner)
+    if finished:
+        # Exactly one process writes the usual results files, and swaps them in whole
+        tmp_path = f"{args.output}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        result_store = ResultStore(args.store)
+        run_id = result_store.start_run("queue", name=f"queue:{os.path.abspath(args.queue)}")
+        with ResultsLog(tmp_path, store=result_store, run_id=run_id) as log:
+            log.write({"type": "run", "queue": os.path.abspath(args.queue)})
+            for record in queue.results():
+                log.write(record)
+        os.replace(tmp_path, args.output)
+    elif queue.drained():
+        print(f"Queue finished; another worker writes {args.output}")
+    else:
+        print(f"Queue not finished yet: {queue.counts()}")
+    return sink.analyzed, sink.cost, deduped, finished
+
+def main():
+    args = parse_args()
+    from src.frame_store import FrameStore
+    from src.frame_dedup import FrameDeduper
+    from src.catalogue import ready_catalogue, catalogue_clips
+    from src.decode_pool import DecodePool
+    if args.queue:
+        cache = None if args.no_cache else ResponseCache()
+        store = None if args.no_cache else FrameStore()
+        analyzed, total_cost, deduped, finished = run_queue(args, cache, store, FrameDeduper())
+        report(args, analyzed, total_cost, deduped, cache, finished)
+        return
+
+    # A resumed run replays the same random sample (same seed) and skips
+    # clips whose results are already in the log.
+    seed = None
+    sampler = None
+    run_id = None
+    done = set()
+    plan = None
+    if args.resume:
+        for record in read_log(args.output):
+            if record["type"] == "run" and seed is None:
+                seed = record["seed"]
+                sampler = record.get("sampler", "stream")
+                args.stratify = record.get("stratify")
+                run_id = record.get("store_run")
+            elif record["type"] == "clip":
+                done.add(record["key"])
+            elif record["type"] == "batch":
+                plan = record
+            elif record["type"] == "batch_submitted":
+                plan["submitted"].append(record["path"])
+                plan["batch_ids"].append(record["batch_id"])
+    elif os.path.exists(args.output):
+        os.remove(args.output)
+
+    # Clip records also go to the result store, under one run per log
+    result_store = ResultStore(args.store)
+    if run_id is None:
+        run_id = result_store.start_run("main", output=os.path.abspath(args.output), batch=args.batch)
+    log = ResultsLog(args.output, store=result_store, run_id=run_id)
+    if seed is None:
+        seed = random.randint(0, 10000)
+        # Sample from the catalogue when it has been fully built: no shard
+        # streaming and fair coverage of the whole dataset
+        if args.local or args.stream or ready_catalogue() is None:
+            sampler = "stream"
+        else:
+            sampler = "catalogue"
+        log.write({"type": "run", "seed": seed, "store_run": run_id, "sampler": sampler, "stratify": args.stratify})
+
+    if args.local:
+        print(f"Reading clips from {args.local}...")
+        clips = local_clips(args.local, args.max_clips)
+    elif sampler == "catalogue":
+        print("Sampling random factory clips from the Egocentric-10K catalogue...")
+        clips = catalogue_clips(args.max_clips, seed=seed, stratify=args.stratify)
+    else:
+        print("Streaming random factory clips from Egocentric-10K...")
+        clips = stream_random_clips(args.max_clips, seed=seed)
+    if done:
+        print(f"Resuming: {len(done)} clip(s) already analyzed")
+    clips = (clip for clip in clips if sample_key(clip) not in done)
+
+    cache = None if args.no_cache else ResponseCache()
+    store = None if args.no_cache else FrameStore()
+    deduper = FrameDeduper()
+    deduped = 0
+    if plan is not None:
+        # A submitted batch outlives the process: pick up its results
+        # instead of decoding and paying for the same frames again.
+        with log:
+            submit_batches(plan, log)
+            print(f"Resuming batch run: waiting for {len(plan['batch_ids'])} batch(es)")
+            analyzed, total_cost = collect_batch(plan, log, cache, done)
+    elif args.batch:
+        with log:
+            with DecodePool() as decoder:
+                decoded = decoder.imap(clips, interval_sec=10, max_frames=FRAMES_PER_CLIP, store=store)
+                plan, deduped = prepare_batch(args.output, decoded, args.max_clips - len(done), cache, deduper)
+            log.write(plan)
+            log.checkpoint()
+            submit_batches(plan, log)
+            analyzed, total_cost = collect_batch(plan, log, cache, done)
+    else:
+        with log:
+            analyzed, total_cost, deduped = run_sync(clips, log, cache, store, deduper, args.max_clips - len(done))
+
+    report(args, analyzed, total_cost, deduped, cache)
+
+def report(args, analyzed, total_cost, deduped, cache, finished=True):
+    """Compact the results log to JSON, print totals and write the metrics files."""
+    if finished:
+        json_path = str(Path(args.output).with_suffix(".json"))
+        total_clips = compact(args.output, json_path)
+        print(f"\nDone! Analyzed {analyzed} clips ({total_clips} in {args.output}).")
+    else:
+        json_path = None
+        print(f"\nDone! Analyzed {analyzed} clips.")
+    print(f"Deduplicated {deduped} near-identical frame(s).")
+    if cache is not None:
+        print(f"Total cost: ${total_cost:.3f} (cache hits: {cache.hits}/{cache.hits + cache.misses}, {cache.hit_rate:.0%})")
+    else:
+        print(f"Total cost: ${total_cost:.3f}")
+    if json_path:
+        print(f"Results saved to {json_path} and {args.store}")
 
-    for clip in tqdm(clips, desc="Processing clips"):
-        meta = clip['json']
-        frames = extract_frames(clip['mp4'], interval_sec=10, max_frames=FRAMES_PER_CLIP)
-        
-        clip_result = {
-            "factory_id": meta['factory_id'],
-            "worker_id": meta['worker_id'],
-            "duration_sec": meta['duration_sec'],
-            "frames": []
-        }
-
-        for i, frame in enumerate(frames):
-            try:
-                analysis = analyze_frame(frame)
-                clip_result["frames"].append({
-                    "frame_idx": i,
-                    "sec": i * 10,
-                    "analysis": analysis["description"]
-                })
-                total_cost += analysis["cost_usd"]
-                time.sleep(0.1)  # Be gentle on API
-            except Exception as e:
-                clip_result["frames"].append({"error": str(e)})
-
-        results.append(clip_result)
-
-    # Save results
-    with open("egocentric_analysis.json", "w") as f:
-        json.dump(results, f, indent=2)
-
-    print(f"\nDone! Analyzed {len(results)} clips.")
-    print(f"Total cost: ${total_cost:.3f}")
-    print(f"Results saved to egocentric_analysis.json")
+    summary = metrics.summary()
+    counters = summary["counters"]
+    print(f"Tokens: {counters.get('prompt_tokens', 0)} input ({counters.get('est_input_tokens', 0)} estimated) / "
+          f"{counters.get('completion_tokens', 0)} output "
+          f"in {counters.get('api_requests', 0)} request(s), {counters.get('api_retries', 0)} retried")
+    for stage, stats in sorted(summary["stages"].items()):
+        print(f"  {stage:<16} {stats['count']:>6} × {stats['mean_sec'] * 1000:8.1f} ms mean, "
+              f"p95 ≤ {stats['p95_le_sec']}s, {stats['total_sec']:.1f}s total")
+    metrics.write_json(args.metrics)
+    print(f"Metrics saved to {args.metrics}")
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
 
 if __name__ == "__main__":
     main()
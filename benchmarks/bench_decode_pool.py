@@ -0,0 +1,59 @@
+"""
+Decode + JPEG-encode throughput of DecodePool at several worker counts.
+
+Run: python benchmarks/bench_decode_pool.py [--video clip.mp4] [--clips 16] [--workers 1 2 4 8]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.decode_pool import DecodePool
+from benchmarks.synthetic_video import make_video
+
+
+def bench(video_bytes, clips, workers, **kwargs):
+    samples = ({"json": {"clip": i}, "mp4": video_bytes} for i in range(clips))
+    start = time.perf_counter()
+    frames = 0
+    with DecodePool(workers=workers) as pool:
+        for _, decoded in pool.imap(samples, **kwargs):
+            frames += len(decoded)
+    elapsed = time.perf_counter() - start
+    return {"workers": workers, "clips": clips, "frames": frames,
+            "seconds": round(elapsed, 3), "frames_per_sec": round(frames / elapsed, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", help="MP4 to decode (default: synthetic 1080p, 60s)")
+    parser.add_argument("--clips", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--interval", type=float, default=10)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    if args.video:
+        video_bytes = Path(args.video).read_bytes()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            video_bytes = Path(make_video(os.path.join(tmp, "synthetic.mp4"))).read_bytes()
+
+    results = {"cpu_count": os.cpu_count(), "runs": []}
+    for workers in args.workers:
+        run = bench(video_bytes, args.clips, workers, interval_sec=args.interval, max_frames=None)
+        results["runs"].append(run)
+        print(f"{workers} worker(s): {run['frames_per_sec']} frames/s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Per-frame CPU time and array size from decoded frame to upload-ready JPEG.
+
+Compares the full-resolution RGB path (`to_rgb().to_ndarray()` then
+`encode_frame`), the reduced-size decode used by `extract_frames`, and the
+direct `encode_video_frame` path, plus decode throughput with and without
+codec threading.
+
+Run: python benchmarks/bench_decode_resize.py [--video clip.mp4] [--frames 60]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import av
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.stream_sampler import frame_to_ndarray, decode_max_edge
+from src.vision_analyzer import encode_frame, encode_video_frame
+from benchmarks.synthetic_video import make_video
+
+# name: (frame -> array handed on from libav, frame -> base64 JPEG)
+PATHS = {
+    "full_rgb": (lambda frame: frame.to_rgb().to_ndarray(),
+                 lambda frame: encode_frame(frame.to_rgb().to_ndarray())),
+    "reduced_rgb": (lambda frame: frame_to_ndarray(frame, decode_max_edge()),
+                    lambda frame: encode_frame(frame_to_ndarray(frame, decode_max_edge()))),
+    "direct_jpeg": (lambda frame: frame_to_ndarray(frame, decode_max_edge(), format="bgr24"),
+                    encode_video_frame),
+}
+
+
+def decoded_frames(video, n, step=30):
+    """Every `step`-th decoded frame, up to `n`, kept as av.VideoFrames."""
+    with av.open(video) as container:
+        frames = []
+        for i, frame in enumerate(container.decode(video=0)):
+            if i % step == 0:
+                frames.append(frame)
+                if len(frames) == n:
+                    break
+        return frames
+
+
+def bench_path(to_array, encode, frames):
+    encode(frames[0])  # warm up encoder tables and swscale contexts
+    cpu = time.process_time()
+    for frame in frames:
+        encode(frame)
+    cpu = time.process_time() - cpu
+    return {"cpu_ms_per_frame": round(cpu / len(frames) * 1000, 2),
+            "array_mb": round(to_array(frames[0]).nbytes / 1e6, 2)}
+
+
+def bench_decode(video, thread_type):
+    with av.open(video) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = thread_type
+        start = time.perf_counter()
+        count = sum(1 for _ in container.decode(stream))
+    return round(count / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", help="MP4 to decode (default: synthetic 1080p, 20s)")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or make_video(os.path.join(tmp, "synthetic.mp4"), seconds=20)
+        frames = decoded_frames(video, args.frames)
+        results = {"cpu_count": os.cpu_count(), "frame": f"{frames[0].width}x{frames[0].height}",
+                   "decode_max_edge": decode_max_edge(), "paths": {}, "decode_fps": {}}
+        for name, (to_array, encode) in PATHS.items():
+            results["paths"][name] = run = bench_path(to_array, encode, frames)
+            print(f"{name:<12} {run['cpu_ms_per_frame']:7.2f} ms/frame, {run['array_mb']:5.2f} MB array")
+        for thread_type in ("NONE", "AUTO"):
+            results["decode_fps"][thread_type] = fps = bench_decode(video, thread_type)
+            print(f"decode thread_type={thread_type:<5} {fps} frames/s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
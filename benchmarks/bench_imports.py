@@ -0,0 +1,85 @@
+"""
+Cold-start import cost of the `src` package and the entry points.
+
+Each target runs in fresh interpreters under `-X importtime`; the report is
+the median wall time and which heavy third-party packages got loaded.
+
+Run: python benchmarks/bench_imports.py [--repeat 5] [--output imports.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+HEAVY = ("datasets", "openai", "av", "cv2", "numpy", "streamlit", "requests", "tqdm")
+
+TARGETS = {
+    "import src": ["-c", "import src"],
+    "import src.config": ["-c", "import src.config"],
+    "import src.stream_sampler": ["-c", "import src.stream_sampler"],
+    "import src.vision_analyzer": ["-c", "import src.vision_analyzer"],
+    "import src.decode_pool": ["-c", "import src.decode_pool"],
+    "import src.shard_index": ["-c", "import src.shard_index"],
+    "analysis/main.py --help": [str(ROOT / "analysis" / "main.py"), "--help"],
+    "preload_clips_fast.py (import)": ["-c", "import preload_clips_fast"],
+    "analysis/app.py (bare run)": ["-c", f"import runpy; runpy.run_path({str(ROOT / 'analysis' / 'app.py')!r}, run_name='app')"],
+}
+
+
+def heavy_imports(stderr):
+    """Top-level heavy packages in `-X importtime` output, with cumulative ms."""
+    loaded = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        name = name.strip()
+        if name in HEAVY:
+            loaded[name] = round(int(cumulative.split(":")[-1]) / 1000, 1)
+    return loaded
+
+
+def bench(args, repeat):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", STREAMLIT_BROWSER_GATHER_USAGE_STATS="false")
+    env.pop("OPENAI_API_KEY", None)  # importing must not need a key
+    times = []
+    loaded = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        times.append(time.perf_counter() - start)
+        loaded = heavy_imports(proc.stderr)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1]}
+    return {"median_ms": round(statistics.median(times) * 1000, 1), "heavy_ms": loaded}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    results = {}
+    for name, target in TARGETS.items():
+        results[name] = result = bench(target, args.repeat)
+        if "error" in result:
+            print(f"{name:<34} FAILED: {result['error']}")
+        else:
+            heavy = ", ".join(sorted(result["heavy_ms"])) or "-"
+            print(f"{name:<34} {result['median_ms']:8.1f} ms   heavy: {heavy}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Local stand-in for the OpenAI chat-completions API, for offline benchmarks.
+
+Point the client at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+Latency, error rate and a requests-per-minute limit (answered with 429 +
+Retry-After) are configurable; GET /stats returns what was served.
+
+The Batch API subset used by `main.py --batch` is served too: file upload
+and content download (/v1/files), batch create and retrieve
+(/v1/batches). A batch completes `--batch-delay` seconds after it is
+created; `--error-rate` fails individual batch requests.
+
+Run: python benchmarks/mock_server.py --port 8000 --latency 0.8 --error-rate 0.02 --rpm 500
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROMPT_TOKENS_PER_IMAGE = 2833
+COMPLETION_TOKENS = 40
+
+
+class MockState:
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, rpm=None, batch_delay=1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.batch_delay = batch_delay
+        self.lock = threading.Lock()
+        self.window = []  # arrival times within the last minute
+        self.latencies = []
+        self.counts = {"ok": 0, "error": 0, "rate_limited": 0, "batched": 0}
+        self.files = {}    # id -> (file object, bytes)
+        self.batches = {}  # id -> batch object
+        self._ids = itertools.count(1)
+
+    def add_file(self, data, purpose, filename="upload.jsonl"):
+        file_id = f"file-mock{next(self._ids)}"
+        obj = {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+               "filename": filename, "purpose": purpose, "status": "processed"}
+        with self.lock:
+            self.files[file_id] = (obj, data)
+        return obj
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch_mock{next(self._ids)}"
+        batch = {"id": batch_id, "object": "batch", "endpoint": endpoint, "completion_window": completion_window,
+                 "input_file_id": input_file_id, "status": "validating", "created_at": int(time.time()),
+                 "output_file_id": None, "error_file_id": None,
+                 "request_counts": {"total": 0, "completed": 0, "failed": 0}}
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch,), daemon=True).start()
+        return batch
+
+    def _run_batch(self, batch):
+        lines = self.files[batch["input_file_id"]][1].decode().splitlines()
+        with self.lock:
+            batch["status"] = "in_progress"
+            batch["request_counts"]["total"] = len(lines)
+        time.sleep(self.batch_delay)
+        output, errors = [], []
+        for line in lines:
+            request = json.loads(line)
+            record = {"id": f"batch_req_{random.getrandbits(32):08x}", "custom_id": request["custom_id"], "error": None}
+            if random.random() < self.error_rate:
+                record["response"] = {"status_code": 500, "request_id": "mock",
+                                      "body": {"error": {"message": "mock server error", "type": "server_error"}}}
+                errors.append(json.dumps(record))
+            else:
+                body = request["body"]
+                n_images = sum(1 for part in body["messages"][0]["content"] if part.get("type") == "image_url")
+                record["response"] = {"status_code": 200, "request_id": "mock",
+                                      "body": completion(n_images, body.get("model", "mock"))}
+                output.append(json.dumps(record))
+        with self.lock:
+            self.counts["batched"] += len(lines)
+        if output:
+            batch["output_file_id"] = self.add_file(("\n".join(output) + "\n").encode(), "batch_output")["id"]
+        if errors:
+            batch["error_file_id"] = self.add_file(("\n".join(errors) + "\n").encode(), "batch_output")["id"]
+        with self.lock:
+            batch["request_counts"].update(completed=len(output), failed=len(errors))
+            batch["status"] = "completed"
+
+    def admit(self):
+        """Sliding-window RPM check; returns seconds to wait, or None if admitted."""
+        if not self.rpm:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            self.window = [t for t in self.window if now - t < 60]
+            if len(self.window) >= self.rpm:
+                return 60 - (now - self.window[0])
+            self.window.append(now)
+        return None
+
+    def record(self, outcome, latency=None):
+        with self.lock:
+            self.counts[outcome] += 1
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def stats(self):
+        with self.lock:
+            return {"counts": dict(self.counts), "latencies": list(self.latencies)}
+
+
+def completion(n_images, model):
+    if n_images > 1:
+        content = json.dumps([f"Worker at station, image {i + 1}: gloves, wrench." for i in range(n_images)])
+    else:
+        content = "Worker assembling a part with a wrench; gloves and safety glasses on."
+    prompt_tokens = 20 + PROMPT_TOKENS_PER_IMAGE * n_images
+    completion_tokens = COMPLETION_TOKENS * n_images
+    return {
+        "id": f"chatcmpl-mock-{random.getrandbits(32):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state = None  # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _not_found(self):
+        self._json(404, {"error": {"message": "not found"}})
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if self.path == "/stats":
+            self._json(200, self.state.stats())
+        elif parts[-2:-1] == ["batches"] and parts[-1] in self.state.batches:
+            with self.state.lock:
+                self._json(200, json.loads(json.dumps(self.state.batches[parts[-1]])))
+        elif parts[-1] == "content" and parts[-2] in self.state.files:
+            data = self.state.files[parts[-2]][1]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._not_found()
+
+    def _upload(self):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + self._body())
+        fields = {}
+        for part in message.iter_parts():
+            fields[part.get_param("name", header="content-disposition")] = (part.get_filename(), part.get_payload(decode=True))
+        filename, data = fields["file"]
+        self._json(200, self.state.add_file(data, fields["purpose"][1].decode(), filename or "upload.jsonl"))
+
+    def do_POST(self):
+        if self.path.endswith("/files"):
+            self._upload()
+            return
+        if self.path.endswith("/batches"):
+            request = json.loads(self._body())
+            if request.get("input_file_id") not in self.state.files:
+                self._json(400, {"error": {"message": "unknown input_file_id"}})
+                return
+            self._json(200, self.state.create_batch(request["input_file_id"], request["endpoint"],
+                                                    request["completion_window"]))
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._not_found()
+            return
+        request = json.loads(self._body())
+        start = time.monotonic()
+
+        wait = self.state.admit()
+        if wait is not None:
+            self.state.record("rate_limited")
+            self._json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                       {"Retry-After": f"{wait:.2f}"})
+            return
+
+        time.sleep(max(0.0, random.gauss(self.state.latency, self.state.jitter * self.state.latency)))
+        if random.random() < self.state.error_rate:
+            self.state.record("error")
+            self._json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+            return
+
+        n_images = sum(1 for part in request["messages"][0]["content"] if part.get("type") == "image_url")
+        self._json(200, completion(n_images, request.get("model", "mock")))
+        self.state.record("ok", time.monotonic() - start)
+
+
+def make_server(port=0, **state_kwargs):
+    """Build a server on 127.0.0.1 (port 0 picks a free one); call serve_forever() to run."""
+    state = MockState(**state_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), type("Handler", (MockHandler,), {"state": state}))
+    server.state = state
+    return server
+
+
+def start_server(**kwargs):
+    """Start a server on a background thread; returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean response time, seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency stddev as a fraction of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rpm", type=int, help="requests per minute before answering 429")
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="seconds before a submitted batch completes")
+    args = parser.parse_args()
+    server = make_server(args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rpm=args.rpm,
+                         batch_delay=args.batch_delay)
+    print(f"Mock OpenAI server on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,158 @@
+"""
+Offline benchmark suite: synthetic video, local decode/encode, and the full
+analysis/main.py flow against the mock vision server.
+
+Run: python benchmarks/run_benchmarks.py --clips 4 --seconds 60 --output bench.json
+Compare two result files: python benchmarks/run_benchmarks.py --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic_video import make_video
+from benchmarks.mock_server import start_server
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))], 4)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)  # ru_maxrss is KiB on Linux
+
+
+def make_clips(directory, clips, **video_kwargs):
+    """clip_XX.mp4 + clip_XX.json pairs as written by the preload scripts."""
+    source = make_video(os.path.join(directory, "source.mp4"), **video_kwargs)
+    for i in range(clips):
+        os.link(source, os.path.join(directory, f"clip_{i:02d}.mp4"))
+        with open(os.path.join(directory, f"clip_{i:02d}.json"), "w") as f:
+            json.dump({"factory_id": i % 3, "worker_id": i, "duration_sec": video_kwargs["seconds"]}, f)
+    os.remove(source)
+
+
+def bench_decode_encode(clip_path, interval_sec):
+    from src.stream_sampler import extract_frames
+    from src.vision_analyzer import encode_frame
+
+    start = time.perf_counter()
+    frames = extract_frames(clip_path, interval_sec=interval_sec, max_frames=None)
+    decode_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoded_bytes = sum(len(encode_frame(frame)) for _, frame in frames)
+    encode_sec = time.perf_counter() - start
+    raw_bytes = sum(frame.nbytes for _, frame in frames)
+    return {
+        "frames": len(frames),
+        "decode_fps": round(len(frames) / decode_sec, 2),
+        "encode_fps": round(len(frames) / encode_sec, 2),
+        "encode_mb_per_sec": round(raw_bytes / encode_sec / 1e6, 2),
+        "encoded_kb_per_frame": round(encoded_bytes / len(frames) / 1024, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_pipeline(clips_dir, clips, server_kwargs):
+    server, base_url = start_server(**server_kwargs)
+    env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="mock")
+    # Every output stays in the temp dir, away from the real result store and metrics
+    output = os.path.join(clips_dir, "analysis.jsonl")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(ROOT / "analysis" / "main.py"), "--local", clips_dir,
+         "--max-clips", str(clips), "--no-cache", "--output", output,
+         "--store", os.path.join(clips_dir, "results.sqlite"),
+         "--metrics", os.path.join(clips_dir, "metrics.json")],
+        env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    wall_sec = time.perf_counter() - start
+    stats = server.state.stats()
+    server.shutdown()
+
+    latencies = stats["latencies"]
+    return {
+        "clips": clips,
+        "wall_sec": round(wall_sec, 3),
+        "requests": stats["counts"],
+        "requests_per_sec": round(stats["counts"]["ok"] / wall_sec, 2),
+        "latency_p50_sec": percentile(latencies, 50),
+        "latency_p95_sec": percentile(latencies, 95),
+        "latency_p99_sec": percentile(latencies, 99),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    """Print relative change of every numeric metric between two result files."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for section in ("decode_encode", "pipeline"):
+        for key, value in new.get(section, {}).items():
+            before = old.get(section, {}).get(key)
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+                print(f"  {section}.{key}: {before} -> {value} ({(value - before) / before:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clips", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--gop", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=10, help="seconds between sampled frames")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock server mean latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, help="mock server requests-per-minute limit")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+    }
+    with tempfile.TemporaryDirectory() as clips_dir:
+        make_clips(clips_dir, args.clips, seconds=args.seconds, width=args.width, height=args.height, gop=args.gop)
+        results["decode_encode"] = bench_decode_encode(os.path.join(clips_dir, "clip_00.mp4"), args.interval)
+        print(f"decode/encode: {results['decode_encode']}")
+        results["pipeline"] = bench_pipeline(
+            clips_dir, args.clips, {"latency": args.latency, "error_rate": args.error_rate, "rpm": args.rpm})
+        print(f"pipeline: {results['pipeline']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
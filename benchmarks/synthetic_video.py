@@ -0,0 +1,45 @@
+"""
+Synthetic H.264 test clips, so benchmarks need neither network nor dataset access.
+
+Run: python benchmarks/synthetic_video.py out.mp4 --seconds 60 --width 1920 --height 1080
+"""
+import argparse
+
+import av
+import numpy as np
+
+
+def make_video(path, seconds=60, width=1920, height=1080, fps=30, gop=60):
+    """Write an MP4 with moving gradients and a sweeping bar (cheap to encode, not static)."""
+    container = av.open(str(path), "w")
+    stream = container.add_stream("h264", rate=fps)
+    stream.width, stream.height = width, height
+    stream.pix_fmt = "yuv420p"
+    stream.codec_context.gop_size = gop
+    stream.options = {"preset": "ultrafast"}
+
+    ramp = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    for i in range(int(seconds * fps)):
+        img = np.empty((height, width, 3), dtype=np.uint8)
+        img[:] = (ramp + i * 4) % 256
+        bar = (i * 16) % width
+        img[:, bar:bar + 32] = 255
+        frame = av.VideoFrame.from_ndarray(img, format="rgb24")
+        for packet in stream.encode(frame):
+            container.mux(packet)
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--gop", type=int, default=60)
+    args = parser.parse_args()
+    make_video(args.path, args.seconds, args.width, args.height, args.fps, args.gop)
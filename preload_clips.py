@@ -6,6 +6,7 @@ Run: python preload_clips.py (~1-2 minutes for 5 clips, may timeout)
 import os
 import json
 from src.stream_sampler import stream_random_clips
+from src.metrics import metrics
 
 CLIPS_DIR = "sample_clips"
 NUM_CLIPS = 5
@@ -32,6 +33,10 @@ def preload_clips():
 
         print(f"  ✓ Saved clip {i+1}/{NUM_CLIPS}: Worker {clip['json']['worker_id']}, Factory {clip['json']['factory_id']}")
 
+    download = metrics.summary()["stages"].get("download")
+    if download:
+        size_mb = metrics.counters.get("bytes_downloaded", 0) / 1e6
+        print(f"  Fetched {size_mb:.1f} MB in {download['total_sec']:.1f}s")
     print(f"\n✓ Done! {NUM_CLIPS} clips saved to {CLIPS_DIR}/")
     print("Now run: streamlit run app.py")
 
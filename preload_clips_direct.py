@@ -14,12 +14,15 @@ Usage:
   python preload_clips_direct.py            # Download just clip 00 (7 min, ~200MB)
   python preload_clips_direct.py --all      # Download clips 1-5 (20 min each, ~600MB each)
 """
+import io
 import os
 import sys
 import json
+import shutil
 import tarfile
+import time
 import requests
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -27,6 +30,8 @@ load_dotenv()
 HF_TOKEN = os.getenv("HF_TOKEN")
 
 CLIPS_DIR = "sample_clips"
+CHUNK_SIZE = 1 << 18        # bytes per read/write while streaming
+MAX_PARALLEL_DOWNLOADS = 4  # tars fetched at once with --all
 
 # Clip 00: Short 7-minute video (recommended for testing)
 CLIP_00_TAR = "https://huggingface.co/datasets/builddotai/Egocentric-10K/resolve/main/factory_001/workers/worker_001/factory001_worker001_part00.tar"
@@ -39,7 +44,128 @@ CLIPS_1_5_TARS = [
     "https://huggingface.co/datasets/builddotai/Egocentric-10K/resolve/main/factory_005/workers/worker_001/factory005_worker001_part00.tar",
 ]
 
-def preload_clips_direct(download_all=False):
+class _TeeReader(io.RawIOBase):
+    """Sequential reader that replays a partial download, then the HTTP body.
+
+    Every new byte read from the body is appended to the partial file, so
+    an interrupted download can resume with a Range request while the tar
+    is still parsed from the beginning.
+    """
+
+    def __init__(self, part_path, replay, chunks):
+        self._replay = open(part_path, "rb") if replay else None
+        self._out = open(part_path, "ab")
+        self._chunks = chunks
+        self._buf = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._replay is not None:
+            n = self._replay.readinto(b)
+            if n:
+                return n
+            self._replay.close()
+            self._replay = None
+        if not self._buf:
+            chunk = next(self._chunks, b"")
+            if not chunk:
+                return 0
+            self._out.write(chunk)
+            self._buf = memoryview(chunk)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def drain(self):
+        buf = bytearray(CHUNK_SIZE)
+        while self.readinto(buf):
+            pass
+
+    def close(self):
+        if self._replay is not None:
+            self._replay.close()
+        self._out.close()
+        super().close()
+
+def _expected_size(response, offset):
+    """Total tar size from Content-Range (206) or Content-Length (200)."""
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", 1)[1])
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length is not None else None
+
+def download_and_extract(tar_url, dest_dir, headers):
+    """Stream one tar straight to disk, extracting clips as the bytes arrive.
+
+    The raw body is kept in `<dest_dir>.part` until the whole tar has been
+    received and its size checked, so a rerun resumes with HTTP Range
+    instead of starting over. Memory use is a few chunks, whatever the
+    tar size. Returns a list of `(mp4_path, metadata)` in tar order.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    part_path = dest_dir + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    request_headers = dict(headers)
+    if offset:
+        request_headers["Range"] = f"bytes={offset}-"
+    response = requests.get(tar_url, headers=request_headers, timeout=60, stream=True)
+    with response:
+        if response.status_code == 200 and offset:
+            # Server ignored the Range header; start from scratch.
+            os.remove(part_path)
+            offset = 0
+        elif response.status_code == 416 and offset:
+            # Partial file already holds the whole tar.
+            pass
+        elif response.status_code not in (200, 206):
+            raise RuntimeError(f"HTTP {response.status_code}")
+        expected = offset if response.status_code == 416 else _expected_size(response, offset)
+        chunks = iter(()) if response.status_code == 416 else response.iter_content(CHUNK_SIZE)
+
+        clips = {}
+        reader = _TeeReader(part_path, offset, chunks)
+        with reader, tarfile.open(fileobj=reader, mode="r|") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                base_name, _, ext = member.name.rpartition(".")
+                clip = clips.setdefault(base_name, {})
+                if ext == "json":
+                    clip["json"] = json.load(tar.extractfile(member))
+                elif ext == "mp4":
+                    path = os.path.join(dest_dir, os.path.basename(member.name))
+                    with open(path, "wb") as f:
+                        shutil.copyfileobj(tar.extractfile(member), f, CHUNK_SIZE)
+                    if os.path.getsize(path) != member.size:
+                        raise IOError(f"{member.name}: wrote {os.path.getsize(path)} of {member.size} bytes")
+                    clip["mp4"] = path
+            reader.drain()
+
+    received = os.path.getsize(part_path)
+    if expected is not None and received != expected:
+        raise IOError(f"incomplete download: {received} of {expected} bytes")
+    os.remove(part_path)
+    return [(clip["mp4"], clip["json"]) for clip in clips.values() if "mp4" in clip and "json" in clip]
+
+def _timed_download(tar_url, dest_dir, headers):
+    """download_and_extract, plus the wall time it took."""
+    start = time.perf_counter()
+    clips = download_and_extract(tar_url, dest_dir, headers)
+    return clips, time.perf_counter() - start
+
+def _remove_empty_dirs(*paths):
+    for path in paths:
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+def preload_clips_direct(download_all=False, max_parallel=MAX_PARALLEL_DOWNLOADS):
     """Download clips by directly fetching tar files from HuggingFace."""
 
     # Validate HF_TOKEN is loaded
@@ -55,70 +181,49 @@ def preload_clips_direct(download_all=False):
     if download_all:
         tar_urls = [CLIP_00_TAR] + CLIPS_1_5_TARS
         print("Downloading ALL clips (clip 00 + clips 1-5)...")
-        print("Total: ~3GB, estimated time: 2-3 minutes")
+        print("Total: ~3GB, estimated time: 1-2 minutes")
     else:
         tar_urls = [CLIP_00_TAR]
         print("Downloading clip 00 only (7 min video, recommended for testing)...")
         print("Size: ~200MB, estimated time: 10-15 seconds")
 
     headers = {"Authorization": f"Bearer {HF_TOKEN}"}
+    staging_dir = os.path.join(CLIPS_DIR, ".partial")
+
+    # Fetch tars in parallel, each into its own staging directory
+    extracted = {}
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        futures = {}
+        for tar_url in tar_urls:
+            tar_name = tar_url.split('/')[-1]
+            print(f"  Fetching {tar_name}...")
+            dest_dir = os.path.join(staging_dir, tar_name.rsplit('.', 1)[0])
+            futures[pool.submit(_timed_download, tar_url, dest_dir, headers)] = tar_url
+
+        for future in as_completed(futures):
+            tar_url = futures[future]
+            try:
+                extracted[tar_url], elapsed = future.result()
+                size_mb = sum(os.path.getsize(path) for path, _ in extracted[tar_url]) / 1e6
+                print(f"  ✓ {tar_url.split('/')[-1]}: {size_mb:.1f} MB of video in {elapsed:.1f}s ({size_mb / max(elapsed, 1e-6):.1f} MB/s)")
+            except Exception as e:
+                print(f"  ✗ Error processing {tar_url.split('/')[-1]}: {e}")
+
+    # Number clips in tar order so the result does not depend on download order
     clip_count = 0
-
     for tar_url in tar_urls:
+        for mp4_path, json_data in extracted.get(tar_url, []):
+            video_path = os.path.join(CLIPS_DIR, f"clip_{clip_count:02d}.mp4")
+            os.replace(mp4_path, video_path)
+            _remove_empty_dirs(os.path.dirname(mp4_path), staging_dir)
 
-        print(f"\n  Fetching {tar_url.split('/')[-1]}...")
-
-        try:
-            response = requests.get(tar_url, headers=headers, timeout=60, stream=True)
-
-            if response.status_code != 200:
-                print(f"  ✗ Failed to download: HTTP {response.status_code}")
-                continue
-
-            # Open tar file from response
-            tar_bytes = BytesIO(response.content)
-            with tarfile.open(fileobj=tar_bytes, mode='r') as tar:
-                members = tar.getmembers()
-
-                # Group files by clip (each clip has .mp4 and .json)
-                clips_in_tar = {}
-                for member in members:
-                    base_name = member.name.rsplit('.', 1)[0]  # Remove extension
-                    if base_name not in clips_in_tar:
-                        clips_in_tar[base_name] = {}
-
-                    ext = member.name.split('.')[-1]
-                    clips_in_tar[base_name][ext] = member
-
-                # Extract clips
-                for base_name, files in clips_in_tar.items():
-                    if 'mp4' not in files or 'json' not in files:
-                        continue
-
-                    # Extract MP4
-                    mp4_member = files['mp4']
-                    mp4_data = tar.extractfile(mp4_member).read()
-
-                    # Extract JSON
-                    json_member = files['json']
-                    json_data = json.load(tar.extractfile(json_member))
-
-                    # Save files
-                    video_path = os.path.join(CLIPS_DIR, f"clip_{clip_count:02d}.mp4")
-                    with open(video_path, "wb") as f:
-                        f.write(mp4_data)
-
-                    metadata_path = os.path.join(CLIPS_DIR, f"clip_{clip_count:02d}.json")
-                    with open(metadata_path, "w") as f:
-                        json.dump(json_data, f, indent=2)
-
-                    duration_min = json_data.get('duration_sec', 0) / 60
-                    print(f"  ✓ Saved clip {clip_count:02d}: Worker {json_data.get('worker_id', 'unknown')}, Factory {json_data.get('factory_id', 'unknown')} ({duration_min:.1f} min)")
-                    clip_count += 1
+            metadata_path = os.path.join(CLIPS_DIR, f"clip_{clip_count:02d}.json")
+            with open(metadata_path, "w") as f:
+                json.dump(json_data, f, indent=2)
 
-        except Exception as e:
-            print(f"  ✗ Error processing tar: {e}")
-            continue
+            duration_min = json_data.get('duration_sec', 0) / 60
+            print(f"  ✓ Saved clip {clip_count:02d}: Worker {json_data.get('worker_id', 'unknown')}, Factory {json_data.get('factory_id', 'unknown')} ({duration_min:.1f} min)")
+            clip_count += 1
 
     if clip_count > 0:
         print(f"\n✓ Done! {clip_count} clip(s) saved to {CLIPS_DIR}/")
@@ -130,7 +235,7 @@ def preload_clips_direct(download_all=False):
             print("   cd analysis && streamlit run app.py")
     else:
         print("\n✗ Failed to download any clips")
-        print("Please check your HF_TOKEN and try again")
+        print("Please check your HF_TOKEN and try again (interrupted downloads resume)")
 
 if __name__ == "__main__":
     # Parse CLI arguments
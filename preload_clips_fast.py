@@ -7,10 +7,19 @@ import os
 import json
 import requests
 from src.config import HF_TOKEN
+from src.metrics import metrics
 
 CLIPS_DIR = "sample_clips"
 NUM_CLIPS = 5
 
+def print_download_summary():
+    """Print bytes fetched and time spent in the "download" stage."""
+    summary = metrics.summary()
+    stage = summary["stages"].get("download", {})
+    size_mb = summary["counters"].get("bytes_downloaded", 0) / 1e6
+    print(f"Downloaded {size_mb:.1f} MB in {stage.get('count', 0)} request(s), {stage.get('total_sec', 0):.1f}s "
+          f"(p95 ≤ {stage.get('p95_le_sec')}s per request)")
+
 def preload_clips_fast():
     """Download sample clips using HuggingFace dataset viewer API."""
     os.makedirs(CLIPS_DIR, exist_ok=True)
@@ -28,7 +37,9 @@ def preload_clips_fast():
     headers = {"Authorization": f"Bearer {HF_TOKEN}"}
 
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=30)
+        with metrics.timer("download"):
+            response = requests.get(url, params=params, headers=headers, timeout=30)
+        metrics.inc("bytes_downloaded", len(response.content))
 
         if response.status_code == 200:
             data = response.json()
@@ -49,6 +60,7 @@ def preload_clips_fast():
                             continue
 
                         metadata = row.get('json', {})
+                        metrics.inc("clips_downloaded")
 
                         # Save video file
                         video_path = os.path.join(CLIPS_DIR, f"clip_{i:02d}.mp4")
@@ -66,6 +78,7 @@ def preload_clips_fast():
                         continue
 
                 print(f"\n✓ Done! {NUM_CLIPS} clips saved to {CLIPS_DIR}/")
+                print_download_summary()
                 print("Now run: streamlit run app.py")
                 return
 
@@ -94,7 +107,10 @@ def preload_clips_fast():
 
         for i in range(NUM_CLIPS):
             try:
-                clip = next(clips_iter)
+                with metrics.timer("download"):
+                    clip = next(clips_iter)
+                metrics.inc("clips_downloaded")
+                metrics.inc("bytes_downloaded", len(clip['mp4']))
 
                 # Save video file
                 video_path = os.path.join(CLIPS_DIR, f"clip_{i:02d}.mp4")
@@ -112,6 +128,7 @@ def preload_clips_fast():
                 continue
 
         print(f"\n✓ Done! {NUM_CLIPS} clips saved to {CLIPS_DIR}/")
+        print_download_summary()
         print("Now run: streamlit run app.py")
 
     except Exception as e:
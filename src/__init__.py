@@ -1,16 +1,39 @@
 """
 Egocentric-10K library - Core modules for video streaming and AI analysis.
+
+Submodules load on first use, so `import src` (or `from src.config import
+...`) does not pull in datasets, PyAV, OpenCV or the OpenAI SDK.
 """
+import importlib
 
 from .config import *
-from .stream_sampler import stream_random_clips, extract_frames
-from .vision_analyzer import analyze_frame
+
+# Public name -> submodule that defines it
+_LAZY = {
+    'stream_random_clips': 'stream_sampler',
+    'extract_frames': 'stream_sampler',
+    'analyze_frame': 'vision_analyzer',
+    'get_client': 'vision_analyzer',
+}
 
 __all__ = [
     'stream_random_clips',
     'extract_frames',
     'analyze_frame',
+    'get_client',
     'MODEL',
     'HF_TOKEN',
     'OPENAI_API_KEY',
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f'.{_LAZY[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
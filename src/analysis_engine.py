@@ -0,0 +1,166 @@
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .config import (
+    MAX_CONCURRENCY, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE,
+    MAX_RETRIES, MAX_TOKENS, PACK_SIZE, MAX_PACK_OUTPUT_TOKENS,
+)
+from .metrics import metrics
+from .rate_limiter import RateLimiter
+from .response_cache import cache_key
+from .vision_analyzer import (
+    analyze_encoded, analyze_encoded_packed, encode_frame, estimate_request_tokens,
+    PackedResponseError, DEFAULT_PROMPT,
+)
+
+BACKOFF_BASE_SEC = 1.0
+BACKOFF_MAX_SEC = 60.0
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait, if it said so."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _is_retryable(error):
+    import openai  # already loaded by the client that raised `error`
+
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _is_rate_limit(error):
+    import openai
+
+    return isinstance(error, openai.RateLimitError)
+
+
+def _fan_out(futures, batch):
+    """Resolve per-frame futures from the future of a whole pack."""
+    error = batch.exception()
+    for i, future in enumerate(futures):
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(batch.result()[i])
+
+
+class AnalysisEngine:
+    """Runs vision requests concurrently under RPM/TPM limits.
+
+    Use `submit()` for a future per frame, `submit_many()` for a future
+    per frame of a group that may be packed `pack_size` frames per
+    request, or `map()` for a list of results in input order. 429s and
+    transient errors are retried with jittered exponential backoff,
+    honouring Retry-After when present. With a `cache` (ResponseCache),
+    hits skip the API and rate limiter. Packs whose reply cannot be
+    parsed fall back to one request per frame.
+    """
+
+    def __init__(self, concurrency=MAX_CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_retries=MAX_RETRIES, cache=None,
+                 pack_size=PACK_SIZE):
+        self.cache = cache
+        self.pack_size = max(1, min(pack_size, MAX_PACK_OUTPUT_TOKENS // MAX_TOKENS))
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def submit(self, frame, prompt=DEFAULT_PROMPT, cache=None):
+        return self.submit_many([frame], prompt, cache=cache)[0]
+
+    def submit_many(self, frames, prompt=DEFAULT_PROMPT, encoded=False, cache=None):
+        """One future per frame; pass `encoded=True` for base64 JPEGs instead of ndarrays.
+
+        `cache` replaces the engine's own cache for these frames.
+        """
+        futures = []
+        for start in range(0, len(frames), self.pack_size):
+            group = frames[start:start + self.pack_size]
+            parts = [Future() for _ in group]
+            batch = self._executor.submit(self._analyze, group, prompt, encoded, cache)
+            batch.add_done_callback(lambda batch, parts=parts: _fan_out(parts, batch))
+            futures.extend(parts)
+        return futures
+
+    def map(self, frames, prompt=DEFAULT_PROMPT):
+        return [future.result() for future in self.submit_many(frames, prompt)]
+
+    def _analyze(self, frames, prompt, encoded=False, cache=None):
+        cache = self.cache if cache is None else cache
+        b64s = frames if encoded else [encode_frame(frame) for frame in frames]
+        keys = [cache_key(b64, prompt) for b64 in b64s] if cache is not None else [None] * len(b64s)
+        results = [cache.get(key) if key else None for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        wasted_cost = 0.0
+        if len(missing) > 1:
+            try:
+                group = [b64s[i] for i in missing]
+                packed = self._call(analyze_encoded_packed, group, prompt,
+                                    est_tokens=estimate_request_tokens(group, prompt))
+            except PackedResponseError as e:
+                metrics.inc("packed_parse_failures")
+                wasted_cost = e.cost_usd
+            else:
+                for i, result in zip(missing, packed):
+                    results[i] = result
+
+        for i in missing:
+            if results[i] is None:
+                results[i] = self._call(analyze_encoded, b64s[i], prompt,
+                                        est_tokens=estimate_request_tokens([b64s[i]], prompt))
+            if keys[i]:
+                cache.put(keys[i], results[i])
+            if wasted_cost:
+                # The unparseable pack was still billed; charge it to the fallback.
+                results[i]["cost_usd"] = round(results[i]["cost_usd"] + wasted_cost, 7)
+                wasted_cost = 0.0
+        return results
+
+    def _call(self, fn, *args, est_tokens):
+        for attempt in range(self.max_retries + 1):
+            with metrics.timer("rate_limit_wait"):
+                self.limiter.acquire(est_tokens)
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self.limiter.settle(est_tokens, getattr(e, "tokens", 0))
+                if attempt == self.max_retries or not _is_retryable(e):
+                    metrics.inc("api_errors")
+                    raise
+                metrics.inc("api_retries")
+                delay = random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt))
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, BACKOFF_BASE_SEC)
+                if _is_rate_limit(e):
+                    metrics.inc("api_rate_limited")
+                    self.limiter.pause(delay)
+                time.sleep(delay)
+                continue
+            tokens = sum(r["tokens"] for r in result) if isinstance(result, list) else result["tokens"]
+            self.limiter.settle(est_tokens, tokens)
+            return result
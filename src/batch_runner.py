@@ -0,0 +1,145 @@
+"""
+OpenAI Batch API runs: one chat-completion request per frame is written to
+JSONL input files, uploaded and submitted, polled until done, and the
+result files are streamed back as `(custom_id, result)` pairs.
+
+Results use the same dict shape as `vision_analyzer.analyze_encoded`, with
+cost at the batch discount (BATCH_PRICE_SCALE).
+"""
+import json
+import os
+import time
+
+from .config import (
+    MODEL, BATCH_PRICE_SCALE, BATCH_MAX_REQUESTS, BATCH_MAX_FILE_BYTES,
+    BATCH_POLL_SEC, BATCH_POLL_MAX_SEC,
+)
+from .metrics import metrics
+from .vision_analyzer import get_client, frame_request, completion_result, estimate_input_tokens, DEFAULT_PROMPT
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+CLIENT_RETRIES = 2  # file and batch calls skip the engine's rate limiter, so the SDK retries them
+
+
+def _client():
+    return get_client().with_options(max_retries=CLIENT_RETRIES)
+
+
+class BatchError(RuntimeError):
+    """A request that the batch did not complete."""
+
+
+class BatchWriter:
+    """Writes frame requests into batch input files `<prefix>-000.jsonl`, ...
+
+    A new file is started before either per-file API limit
+    (`max_requests`, `max_bytes`) would be exceeded; `paths` lists the
+    files written so far.
+    """
+
+    def __init__(self, prefix, max_requests=BATCH_MAX_REQUESTS, max_bytes=BATCH_MAX_FILE_BYTES):
+        self.prefix = prefix
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.paths = []
+        self._file = None
+        self._requests = 0
+        self._bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, custom_id, b64, prompt=DEFAULT_PROMPT):
+        body = dict(model=MODEL, **frame_request(b64, prompt))
+        line = (json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body}) + "\n").encode()
+        if self._file is None or self._requests >= self.max_requests or self._bytes + len(line) > self.max_bytes:
+            self._next_file()
+        self._file.write(line)
+        self._requests += 1
+        self._bytes += len(line)
+        metrics.inc("est_input_tokens", estimate_input_tokens([b64], prompt)[0])
+
+    def _next_file(self):
+        self.close()
+        path = f"{self.prefix}-{len(self.paths):03d}.jsonl"
+        self._file = open(path, "wb")
+        self.paths.append(path)
+        self._requests = self._bytes = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_requests(path, custom_ids):
+    """Yield `(custom_id, b64)` for the requests in input file `path` whose id is in `custom_ids`."""
+    with open(path) as f:
+        for line in f:
+            request = json.loads(line)
+            if request["custom_id"] in custom_ids:
+                image = next(part for part in request["body"]["messages"][0]["content"] if part["type"] == "image_url")
+                yield request["custom_id"], image["image_url"]["url"].split(",", 1)[1]
+
+
+def submit(path):
+    """Upload one input file and start a batch on it; returns the batch id."""
+    client = _client()
+    with metrics.timer("batch_upload"), open(path, "rb") as f:
+        upload = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(input_file_id=upload.id, endpoint=ENDPOINT, completion_window="24h")
+    metrics.inc("batches_submitted")
+    metrics.inc("bytes_uploaded", os.path.getsize(path))
+    return batch.id
+
+
+def wait(batch_id, poll_sec=BATCH_POLL_SEC, max_poll_sec=BATCH_POLL_MAX_SEC, on_poll=None):
+    """Poll until the batch reaches a terminal status, doubling the interval each time."""
+    client = _client()
+    delay = poll_sec
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        if on_poll is not None:
+            on_poll(batch)
+        time.sleep(delay)
+        delay = min(delay * 2, max_poll_sec)
+
+
+def _parse_line(record, price_scale):
+    from openai.types.chat import ChatCompletion
+
+    custom_id = record["custom_id"]
+    response = record.get("response") or {}
+    if record.get("error") or response.get("status_code") != 200:
+        error = record.get("error") or (response.get("body") or {}).get("error") or {}
+        metrics.inc("batch_request_errors")
+        return custom_id, BatchError(f"{error.get('code') or response.get('status_code')}: {error.get('message', 'request failed')}")
+    result = completion_result(ChatCompletion.model_validate(response["body"]), price_scale)
+    metrics.inc("api_requests")
+    metrics.inc("prompt_tokens", result["input_tokens"])
+    metrics.inc("completion_tokens", result["output_tokens"])
+    metrics.inc("cost_usd", result["cost_usd"])
+    return custom_id, result
+
+
+def iter_results(batch, price_scale=BATCH_PRICE_SCALE):
+    """Yield `(custom_id, result_or_BatchError)` from a finished batch's output and error files.
+
+    The files are streamed line by line, so memory does not grow with the
+    batch. Requests missing from both files were never run (e.g. the batch
+    expired); callers should treat absent ids as failures.
+    """
+    client = _client()
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        with client.files.with_streaming_response.content(file_id) as response:
+            for line in response.iter_lines():
+                if line.strip():
+                    yield _parse_line(json.loads(line), price_scale)
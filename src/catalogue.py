@@ -0,0 +1,306 @@
+"""
+Local catalogue of every Egocentric-10K shard and clip, for instant sampling.
+
+Shards come from the Hub's file listing (path, size, content hash); clips
+come from each shard's tar headers via the byte-range shard index. Both
+live in SQLite and are refreshed incrementally: only new or changed
+shards are indexed again. Sampling N clips, uniformly or stratified by
+factory or worker, is then a rowid lookup, followed by one Range GET per
+chosen clip.
+
+Run: python -m src.catalogue refresh            # list shards, index new ones
+     python -m src.catalogue sample 20 --stratify factory
+     python -m src.catalogue stats
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .config import HF_TOKEN, DATASET_REPO, CATALOGUE_PATH, CATALOGUE_INDEX_WORKERS, PREFETCH_CLIPS
+
+SHARD_PATH = re.compile(r"factory_?(\d+)_worker_?(\d+)_part_?(\d+)\.tar$")
+STRATA = {"factory": ("factory_id",), "worker": ("factory_id", "worker_id")}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    url TEXT NOT NULL,
+    version TEXT,
+    size INTEGER,
+    factory_id INTEGER,
+    worker_id INTEGER,
+    part INTEGER,
+    indexed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS clips (
+    id INTEGER PRIMARY KEY,
+    shard_id INTEGER NOT NULL REFERENCES shards(id),
+    key TEXT NOT NULL,
+    factory_id INTEGER,
+    worker_id INTEGER,
+    part INTEGER,
+    duration_sec REAL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    metadata TEXT NOT NULL,
+    UNIQUE (shard_id, key)
+);
+CREATE INDEX IF NOT EXISTS clips_stratum ON clips(factory_id, worker_id);
+"""
+
+
+def shard_url(path):
+    return f"https://huggingface.co/datasets/{DATASET_REPO}/resolve/main/{path}"
+
+
+def list_shards():
+    """`(path, size, version)` for every tar in the dataset repo, from one Hub listing."""
+    from huggingface_hub import HfApi  # slow to import; only refresh needs it
+
+    for entry in HfApi().list_repo_tree(DATASET_REPO, repo_type="dataset", recursive=True, token=HF_TOKEN):
+        if entry.path.endswith(".tar") and hasattr(entry, "size"):
+            yield entry.path, entry.size, getattr(entry, "blob_id", None)
+
+
+class Catalogue:
+    """SQLite catalogue of shards and clips with O(1) random access by rowid.
+
+    Safe to share between threads (one connection per thread). Clip ids
+    stay dense as long as shards are only added, which keeps `sample()`
+    to a single indexed lookup.
+    """
+
+    def __init__(self, path=CATALOGUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._conn().execute("SELECT count(*) FROM clips").fetchone()[0]
+
+    def update_shards(self, listing):
+        """Sync the shard table with `(path, size, version)` entries.
+
+        New shards are added, shards whose version changed are marked for
+        re-indexing, and shards missing from the listing are dropped along
+        with their clips. Returns (added, changed, removed).
+        """
+        conn = self._conn()
+        known = {row["path"]: row for row in conn.execute("SELECT id, path, version FROM shards")}
+        seen = set()
+        added = changed = 0
+        with conn:
+            for path, size, version in listing:
+                seen.add(path)
+                match = SHARD_PATH.search(path)
+                factory_id, worker_id, part = (int(g) for g in match.groups()) if match else (None, None, None)
+                row = known.get(path)
+                if row is None:
+                    conn.execute("""
+                        INSERT INTO shards (path, url, version, size, factory_id, worker_id, part)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                        (path, shard_url(path), version, size, factory_id, worker_id, part))
+                    added += 1
+                elif row["version"] != version:
+                    conn.execute("DELETE FROM clips WHERE shard_id = ?", (row["id"],))
+                    conn.execute("UPDATE shards SET version = ?, size = ?, indexed = 0 WHERE id = ?",
+                                 (version, size, row["id"]))
+                    changed += 1
+            removed = [row["id"] for path, row in known.items() if path not in seen]
+            for shard_id in removed:
+                conn.execute("DELETE FROM clips WHERE shard_id = ?", (shard_id,))
+                conn.execute("DELETE FROM shards WHERE id = ?", (shard_id,))
+        return added, changed, len(removed)
+
+    def _add_clips(self, shard, index):
+        with self._conn() as conn:
+            for clip in index["clips"]:
+                meta = clip.get("metadata") or {}
+                conn.execute("""
+                    INSERT OR REPLACE INTO clips
+                        (shard_id, key, factory_id, worker_id, part, duration_sec, offset, size, metadata)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (shard["id"], clip["key"], meta.get("factory_id", shard["factory_id"]),
+                     meta.get("worker_id", shard["worker_id"]), shard["part"], meta.get("duration_sec"),
+                     clip["offset"], clip["size"], json.dumps(meta)))
+            conn.execute("UPDATE shards SET indexed = 1 WHERE id = ?", (shard["id"],))
+
+    def index_clips(self, workers=CATALOGUE_INDEX_WORKERS, progress=None):
+        """Read the tar headers of every shard not yet indexed; returns the number of clips added."""
+        from .shard_index import build_index
+
+        shards = self._conn().execute("SELECT * FROM shards WHERE indexed = 0 ORDER BY id").fetchall()
+        before = len(self)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(build_index, shard["url"]): shard for shard in shards}
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    self._add_clips(shard, future.result())
+                except Exception as e:
+                    print(f"  ✗ {shard['path']}: {e}")
+                if progress is not None:
+                    progress(shard)
+        return len(self) - before
+
+    def refresh(self, listing=None, index=True, workers=CATALOGUE_INDEX_WORKERS, progress=None):
+        """Update shards from the Hub listing (or `listing`), then index new shards' clips."""
+        added, changed, removed = self.update_shards(list_shards() if listing is None else listing)
+        clips = self.index_clips(workers, progress) if index else 0
+        return {"shards_added": added, "shards_changed": changed, "shards_removed": removed, "clips_added": clips}
+
+    def _clip(self, row):
+        return {
+            "key": row["key"], "url": row["url"], "offset": row["offset"], "size": row["size"],
+            "metadata": json.loads(row["metadata"]), "factory_id": row["factory_id"],
+            "worker_id": row["worker_id"], "part": row["part"], "duration_sec": row["duration_sec"],
+        }
+
+    def _by_ids(self, ids):
+        rows = self._conn().execute(f"""
+            SELECT clips.*, shards.url FROM clips JOIN shards ON shards.id = clips.shard_id
+            WHERE clips.id IN ({",".join("?" * len(ids))})""", ids).fetchall()
+        by_id = {row["id"]: row for row in rows}
+        return [self._clip(by_id[i]) for i in ids if i in by_id]
+
+    def _sample_ids(self, n, rng, where="", args=()):
+        conn = self._conn()
+        if not where:
+            # Dense rowids: draw ids directly, topping up for any gaps
+            max_id = conn.execute("SELECT max(id) FROM clips").fetchone()[0] or 0
+            total = len(self)
+            n = min(n, total)
+            chosen = []
+            drawn = set()
+            while len(chosen) < n:
+                candidates = [i for i in rng.sample(range(1, max_id + 1), min(max_id, 2 * (n - len(chosen))))
+                              if i not in drawn]
+                drawn.update(candidates)
+                present = {row[0] for row in conn.execute(
+                    f"SELECT id FROM clips WHERE id IN ({','.join('?' * len(candidates))})", candidates)}
+                chosen.extend(i for i in candidates if i in present)
+            return chosen[:n]
+        count = conn.execute(f"SELECT count(*) FROM clips WHERE {where}", args).fetchone()[0]
+        return [conn.execute(f"SELECT id FROM clips WHERE {where} ORDER BY id LIMIT 1 OFFSET ?",
+                             args + (offset,)).fetchone()[0]
+                for offset in rng.sample(range(count), min(n, count))]
+
+    def sample(self, n, seed=None, stratify=None):
+        """`n` distinct random clips, each `{key, url, offset, size, metadata, ...}`.
+
+        `stratify="factory"` (or `"worker"`) spreads the sample evenly over
+        factories (or factory/worker pairs) instead of weighting them by
+        their number of clips. Strata with fewer clips than their share give
+        the rest to the others, so the sample is `n` clips whenever the
+        catalogue holds that many. The same `seed` gives the same sample
+        from the same catalogue.
+        """
+        rng = random.Random(seed)
+        if stratify is None:
+            return self._by_ids(self._sample_ids(n, rng))
+
+        columns = STRATA[stratify]
+        strata = [(tuple(row)[:-1], row[-1]) for row in self._conn().execute(
+            f"SELECT {', '.join(columns)}, count(*) FROM clips GROUP BY {', '.join(columns)} "
+            f"ORDER BY {', '.join(columns)}")]
+        # Smallest strata first, so the quota a stratum is too small to fill
+        # goes to the larger ones after it; ties in random order
+        rng.shuffle(strata)
+        strata.sort(key=lambda stratum: stratum[1])
+        where = " AND ".join(f"{column} IS ?" for column in columns)
+        ids = []
+        for i, (stratum, count) in enumerate(strata):
+            quota = min(count, -(-(n - len(ids)) // (len(strata) - i)))
+            if quota:
+                ids.extend(self._sample_ids(quota, rng, where, stratum))
+        rng.shuffle(ids)
+        return self._by_ids(ids)
+
+    def stats(self):
+        conn = self._conn()
+        shards, indexed = conn.execute("SELECT count(*), coalesce(sum(indexed), 0) FROM shards").fetchone()
+        clips, hours, factories, workers = conn.execute("""
+            SELECT count(*), coalesce(sum(duration_sec), 0) / 3600, count(DISTINCT factory_id),
+                   count(DISTINCT factory_id || '/' || worker_id) FROM clips""").fetchone()
+        return {"shards": shards, "shards_indexed": indexed, "clips": clips, "hours": round(hours, 1),
+                "factories": factories, "workers": workers}
+
+
+def ready_catalogue(path=CATALOGUE_PATH):
+    """The catalogue at `path` if it exists and every shard in it is indexed, else None.
+
+    A partly indexed catalogue (e.g. after an interrupted refresh) would
+    sample only the shards indexed so far, so it is not used, with a
+    warning saying why. Nothing is created when there is no catalogue.
+    """
+    if not os.path.exists(path):
+        return None
+    catalogue = Catalogue(path)
+    stats = catalogue.stats()
+    if not stats["clips"]:
+        return None
+    if stats["shards_indexed"] < stats["shards"]:
+        print(f"Warning: the clip catalogue has only {stats['shards_indexed']} of {stats['shards']} shards "
+              "indexed, so it is not used. Run `python -m src.catalogue refresh` to finish it.")
+        return None
+    return catalogue
+
+
+def _fetch_samples(clips):
+    from .shard_index import fetch_clip
+
+    for clip in clips:
+        yield {"__key__": clip["key"], "json": clip["metadata"], "mp4": fetch_clip(clip["url"], clip)}
+
+
+def catalogue_clips(n, seed=None, stratify=None, prefetch_depth=PREFETCH_CLIPS, catalogue=None):
+    """Like `stream_random_clips`, but sampled from the catalogue and fetched by byte range.
+
+    Only the chosen clips are downloaded, `prefetch_depth` ahead.
+    """
+    from .stream_sampler import prefetch, _timed_download
+
+    clips = (catalogue or Catalogue()).sample(n, seed=seed, stratify=stratify)
+    return prefetch(_timed_download(_fetch_samples(clips)), prefetch_depth)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and sample the local Egocentric-10K clip catalogue.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh = commands.add_parser("refresh", help="sync shards with the Hub and index new ones")
+    refresh.add_argument("--no-clips", action="store_true", help="only update the shard list")
+    refresh.add_argument("--workers", type=int, default=CATALOGUE_INDEX_WORKERS)
+    sample = commands.add_parser("sample", help="print a random sample of clips")
+    sample.add_argument("n", type=int)
+    sample.add_argument("--stratify", choices=sorted(STRATA))
+    sample.add_argument("--seed", type=int)
+    commands.add_parser("stats", help="catalogue size and coverage")
+    args = parser.parse_args()
+
+    catalogue = Catalogue()
+    if args.command == "refresh":
+        print(f"Listing {DATASET_REPO}...")
+        print(catalogue.refresh(index=not args.no_clips, workers=args.workers,
+                                progress=lambda shard: print(f"  ✓ {shard['path']}")))
+    elif args.command == "sample":
+        for clip in catalogue.sample(args.n, seed=args.seed, stratify=args.stratify):
+            print(f"factory {clip['factory_id']} worker {clip['worker_id']} part {clip['part']} "
+                  f"{clip['key']} ({clip['size'] / 1e6:.1f} MB) {clip['url']}")
+    print(catalogue.stats())
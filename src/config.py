@@ -5,14 +5,82 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 HF_TOKEN = os.getenv("HF_TOKEN")
+DATASET_REPO = "builddotai/Egocentric-10K"
 
 # Safety & cost controls
 MAX_CLIPS = 50
 FRAMES_PER_CLIP = 3
 FRAME_INTERVAL_SEC = 10
+SHUFFLE_BUFFER_SIZE = 8   # clips held for shuffling; each is a full MP4 in memory
+PREFETCH_CLIPS = 2        # clips downloaded ahead of the one being analysed
 MODEL = "gpt-4o-mini"
 MAX_TOKENS = 150
 
-# Cost tracking
-COST_PER_1K_TOKENS_INPUT = 0.150 / 1000   # $0.15 / 1M tokens → per 1K
-COST_PER_1K_TOKENS_OUTPUT = 0.600 / 1000  # $0.60 / 1M tokens
+# Image preprocessing before upload (see vision_analyzer.preprocess_frame)
+IMAGE_DETAIL = "low"   # "low" (fixed token cost), "high" or "auto" (tiled by size)
+IMAGE_MAX_EDGE = 512   # long edge in px after resize; None keeps the decoded size
+IMAGE_CROP = None      # centre-crop fraction (e.g. 0.8) or (x, y, w, h) ROI in px
+JPEG_QUALITY = 85
+
+# Decoding (see stream_sampler.extract_frames)
+DECODE_THREAD_TYPE = "AUTO"  # libav codec threading: "AUTO" (frame + slice), "SLICE", "FRAME" or "NONE"
+
+# Cost tracking (USD per single token)
+COST_PER_TOKEN_INPUT = 0.150 / 1_000_000   # $0.15 / 1M tokens
+COST_PER_TOKEN_OUTPUT = 0.600 / 1_000_000  # $0.60 / 1M tokens
+
+# Concurrency & rate limits (gpt-4o-mini tier 1 defaults)
+MAX_CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+MAX_RETRIES = 5
+
+# Batch API mode (see src/batch_runner.py, analysis/main.py --batch)
+BATCH_PRICE_SCALE = 0.5                 # Batch API bills half the synchronous price
+BATCH_MAX_REQUESTS = 50_000             # per batch input file (API limit)
+BATCH_MAX_FILE_BYTES = 190 * 1024 ** 2  # per batch input file; the API allows 200 MB
+BATCH_POLL_SEC = 30                     # first status poll interval, doubling up to the max
+BATCH_POLL_MAX_SEC = 600
+
+# Response cache (see src/response_cache.py)
+CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "vision_responses.sqlite")
+CACHE_MAX_ENTRIES = 100_000
+CACHE_MAX_AGE_DAYS = 30
+
+# Queryable results of every run (see src/result_store.py)
+RESULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(CACHE_PATH)), "egocentric_results.sqlite")
+
+# Near-duplicate frame skipping (see src/frame_dedup.py)
+DEDUP_HAMMING_THRESHOLD = 5  # max differing bits of 64 to count as a duplicate; None disables
+DEDUP_CROSS_CLIP = False     # also match against earlier clips from the same factory
+
+# Multi-frame packed requests (see vision_analyzer.analyze_encoded_packed)
+PACK_SIZE = 1                  # frames per request; 1 sends one frame per call
+MAX_PACK_OUTPUT_TOKENS = 1200  # caps PACK_SIZE so that PACK_SIZE * MAX_TOKENS fits
+
+# Byte-range access to dataset tars (see src/shard_index.py)
+SHARD_INDEX_DIR = os.path.join(os.path.dirname(CACHE_PATH), "shard_index")
+RANGE_BLOCK_SIZE = 1 << 20  # read-ahead per Range request when decoding remote clips
+
+# Local shard/clip catalogue for instant sampling (see src/catalogue.py)
+CATALOGUE_PATH = os.path.join(os.path.dirname(CACHE_PATH), "catalogue.sqlite")
+CATALOGUE_INDEX_WORKERS = 8  # shards whose tar headers are read in parallel
+
+# Live-feed mode (see src/live_feed.py, analysis/live.py)
+LIVE_SAMPLE_FPS = 2      # frames per second of video kept as candidates for analysis
+LIVE_RING_SIZE = 8       # most recent candidates buffered; older ones are dropped
+LIVE_MAX_IN_FLIGHT = 4   # concurrent requests; the freshest frame goes out when one returns
+
+# Shared job queue for multi-worker runs (see src/job_queue.py, analysis/main.py --queue)
+QUEUE_LEASE_SEC = 300     # a job returns to the queue if its worker stops renewing for this long
+QUEUE_HEARTBEAT_SEC = 60  # lease renewal interval
+QUEUE_MAX_ATTEMPTS = 3    # claims per job before it is marked failed
+QUEUE_POLL_SEC = 5        # idle workers re-check for expired leases this often
+
+# Decode/encode worker processes (see src/decode_pool.py)
+DECODE_WORKERS = os.cpu_count() or 1
+DECODE_MAX_PENDING_BYTES = 512 * 1024 ** 2  # in-memory MP4s copied to /dev/shm for workers at any one time
+
+# Decoded-frame store (see src/frame_store.py)
+FRAME_STORE_DIR = os.path.join(os.path.dirname(CACHE_PATH), "frames")
+FRAME_STORE_MAX_BYTES = 5 * 1024 ** 3
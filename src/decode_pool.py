@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .config import DECODE_WORKERS, DECODE_MAX_PENDING_BYTES
+from .frame_dedup import dhash
+from .metrics import metrics
+from .stream_sampler import extract_frames
+from .vision_analyzer import encode_frame
+
+
+def _decode_clip(source, size, **kwargs):
+    """Worker: decode one clip and return `(sec, b64_jpeg, dhash)` per frame.
+
+    `source` is a file path, or the name of a shared-memory block holding
+    `size` bytes of MP4 when `size` is given. Frames leave the worker as
+    JPEG, never as pickled ndarrays. The worker's metrics for this clip
+    come back alongside the frames.
+    """
+    metrics.reset()
+    shm = None
+    if size is not None:
+        shm = shared_memory.SharedMemory(name=source)
+        source = shm.buf[:size]
+    try:
+        frames = extract_frames(source, **kwargs)
+        hashes = dhash([frame for _, frame in frames])
+        frames = [(sec, encode_frame(frame), int(h)) for (sec, frame), h in zip(frames, hashes)]
+        return frames, metrics.snapshot()
+    finally:
+        if shm is not None:
+            source.release()
+            shm.close()
+
+
+class DecodePool:
+    """Spreads clip decoding and JPEG encoding over worker processes.
+
+    In-memory MP4s are handed over through `multiprocessing.shared_memory`
+    (paths are passed as-is). At most `max_pending` clips, holding at most
+    `max_pending_bytes` of shared memory, are in flight, which bounds
+    memory however long the input iterator is and however many cores
+    there are. A single clip larger than the byte limit still goes
+    through, on its own.
+
+    Each worker gets its own copy of a `store` (FrameStore) passed on to
+    `extract_frames`, so the frames they add are counted against the
+    caller's store as their clips come back, and the store is swept once
+    more when `imap` finishes, which keeps it under its size limit.
+    """
+
+    def __init__(self, workers=DECODE_WORKERS, max_pending=None, max_pending_bytes=DECODE_MAX_PENDING_BYTES):
+        self.max_pending = max_pending or 2 * workers
+        self.max_pending_bytes = max_pending_bytes
+        # The cores are already split between workers; libav threads on top would oversubscribe them
+        self.decode_threads = max(1, (os.cpu_count() or 1) // workers)
+        # Not fork: workers start while prefetch and tqdm threads may hold locks
+        # (e.g. the metrics lock), which a forked child would inherit held
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, mp4, **kwargs):
+        kwargs.setdefault("decode_threads", self.decode_threads)
+        if isinstance(mp4, (str, os.PathLike)):
+            return self._executor.submit(_decode_clip, os.fspath(mp4), None, **kwargs), None
+        data = memoryview(mp4).cast("B")
+        shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+        return self._executor.submit(_decode_clip, shm.name, len(data), **kwargs), shm
+
+    def imap(self, clips, on_error=None, **kwargs):
+        """Yield `(clip, frames)` in input order for clips shaped like dataset samples.
+
+        `clip['mp4']` may be bytes or a path; the yielded clip omits it so
+        the MP4 is released as soon as it has been handed to a worker.
+        `frames` is a list of `(sec, b64_jpeg, dhash)`. With `on_error`, a
+        clip that fails to decode is reported as `on_error(clip, error)`
+        and skipped instead of ending the iteration. Other keyword
+        arguments go to `extract_frames`.
+        """
+        store = kwargs.get("store")
+        pending = deque()
+        pending_bytes = 0
+        try:
+            for clip in clips:
+                mp4 = clip["mp4"]
+                size = 0 if isinstance(mp4, (str, os.PathLike)) else memoryview(mp4).nbytes
+                # Make room before the clip is copied into shared memory
+                while pending and (len(pending) >= self.max_pending
+                                   or pending_bytes + size > self.max_pending_bytes):
+                    item = pending.popleft()
+                    pending_bytes -= item[2].size if item[2] is not None else 0
+                    yield from self._collect(item, on_error, store)
+                future, shm = self._submit(mp4, **kwargs)
+                pending.append(({k: v for k, v in clip.items() if k != "mp4"}, future, shm))
+                pending_bytes += shm.size if shm is not None else 0
+                del clip, mp4
+            while pending:
+                yield from self._collect(pending.popleft(), on_error, store)
+            if store is not None:
+                store.evict()
+        finally:
+            for _, future, shm in pending:
+                future.cancel()
+                self._release(future, shm)
+
+    @staticmethod
+    def _release(future, shm):
+        if shm is None:
+            return
+        if not future.cancelled():
+            try:
+                future.exception()
+            except Exception:
+                pass
+        shm.close()
+        shm.unlink()
+
+    def _collect(self, item, on_error=None, store=None):
+        """`[(clip, frames)]`, or `[]` for a failed clip handed to `on_error`."""
+        clip, future, shm = item
+        try:
+            frames, snapshot = future.result()
+        except Exception as e:
+            if on_error is None:
+                raise
+            metrics.inc("clips_failed")
+            on_error(clip, e)
+            return []
+        finally:
+            self._release(future, shm)
+        metrics.merge(snapshot)
+        if store is not None:
+            store.added(snapshot["counters"].get("frame_store_puts", 0))
+        return [(clip, frames)]
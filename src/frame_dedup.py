@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+from .config import DEDUP_HAMMING_THRESHOLD, DEDUP_CROSS_CLIP
+
+
+def dhash(frames):
+    """64-bit difference hashes for a batch of RGB frames, as a uint64 array."""
+    if not len(frames):
+        return np.empty(0, dtype=np.uint64)
+    small = np.stack([
+        cv2.resize(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+        for frame in frames
+    ])
+    bits = small[:, :, 1:] > small[:, :, :-1]
+    return np.packbits(bits.reshape(len(frames), 64), axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def hamming(hashes, h):
+    """Bitwise Hamming distance from each entry of `hashes` to `h`."""
+    xor = np.bitwise_xor(hashes, np.uint64(h))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class FrameIndex:
+    """Hashes of frames already sent for analysis, each with a caller reference."""
+
+    def __init__(self, threshold=DEDUP_HAMMING_THRESHOLD):
+        self.threshold = threshold
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._refs = []
+
+    def __len__(self):
+        return len(self._refs)
+
+    def lookup(self, h):
+        """Return `(ref, distance)` of the closest indexed frame within threshold, else None."""
+        if not self._refs:
+            return None
+        distances = hamming(self._hashes, h)
+        i = int(np.argmin(distances))
+        if distances[i] > self.threshold:
+            return None
+        return self._refs[i], int(distances[i])
+
+    def add(self, h, ref):
+        self._hashes = np.append(self._hashes, np.uint64(h))
+        self._refs.append(ref)
+
+
+class FrameDeduper:
+    """Per-clip and, optionally, per-factory cross-clip near-duplicate detection."""
+
+    def __init__(self, threshold=DEDUP_HAMMING_THRESHOLD, cross_clip=DEDUP_CROSS_CLIP):
+        self.threshold = threshold
+        self.cross_clip = cross_clip
+        self._factories = {}
+
+    def reset(self):
+        """Forget every frame indexed so far."""
+        self._factories.clear()
+
+    def dedupe(self, frames, refs, factory_id=None):
+        """Match one clip's frames against what has already been analysed.
+
+        Returns a list with, per frame, the `(ref, distance)` of an earlier
+        near-identical frame, or None if the frame is new. New frames are
+        indexed under the matching entry of `refs`.
+        """
+        if self.threshold is None:
+            return [None] * len(frames)
+        return self.dedupe_hashes(dhash(frames), refs, factory_id)
+
+    def dedupe_hashes(self, hashes, refs, factory_id=None):
+        """Same as `dedupe()` for frames already hashed with `dhash()`."""
+        if self.threshold is None:
+            return [None] * len(hashes)
+
+        clip_index = FrameIndex(self.threshold)
+        shared = None
+        if self.cross_clip:
+            shared = self._factories.setdefault(factory_id, FrameIndex(self.threshold))
+
+        matches = []
+        for h, ref in zip(hashes, refs):
+            match = clip_index.lookup(h)
+            if match is None and shared is not None:
+                match = shared.lookup(h)
+            if match is None:
+                clip_index.add(h, ref)
+                if shared is not None:
+                    shared.add(h, ref)
+            matches.append(match)
+        return matches
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .config import FRAME_STORE_DIR, FRAME_STORE_MAX_BYTES
+
+SAMPLE_BYTES = 1 << 20  # head/tail bytes hashed to identify a clip
+EVICT_EVERY = 64        # puts between eviction sweeps
+
+
+def _sampled_hash(size, head, tail):
+    h = hashlib.sha256(str(size).encode())
+    h.update(head)
+    h.update(tail)
+    return h.hexdigest()[:32]
+
+
+def content_key(source):
+    """Content key for a path or bytes-like clip (size + first/last MiB), else None."""
+    if isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+        with open(source, "rb") as f:
+            head = f.read(SAMPLE_BYTES)
+            f.seek(max(size - SAMPLE_BYTES, 0))
+            tail = f.read()
+        return _sampled_hash(size, head, tail)
+    if isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, "madvise"):
+        view = memoryview(source).cast("B")
+        return _sampled_hash(len(view), view[:SAMPLE_BYTES], view[-SAMPLE_BYTES:])
+    return None
+
+
+def _atomic_write(path, write):
+    """Write via a temp file in the same directory, then rename into place."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class FrameStore:
+    """On-disk store of decoded frames keyed by clip content, timestamp and variant.
+
+    Each frame is an .npy file under `<root>/<clip_key>/<variant>/`, named
+    by target and real timestamp and loaded back memory-mapped. Writes are
+    atomic renames so several processes can share one store; the least
+    recently used frames are evicted once the store exceeds `max_bytes`.
+    """
+
+    def __init__(self, root=FRAME_STORE_DIR, max_bytes=FRAME_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._puts = 0
+
+    def clip_key(self, source):
+        return content_key(source)
+
+    def _dir(self, clip_key, variant):
+        return os.path.join(self.root, clip_key, variant)
+
+    @staticmethod
+    def _prefix(target_sec):
+        return f"t{round(target_sec * 1000)}-"
+
+    def duration(self, clip_key):
+        try:
+            with open(os.path.join(self.root, clip_key, "clip.json")) as f:
+                return json.load(f)["duration_sec"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set_duration(self, clip_key, duration_sec):
+        path = os.path.join(self.root, clip_key, "clip.json")
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _atomic_write(path, lambda f: f.write(json.dumps({"duration_sec": duration_sec}).encode()))
+
+    def get(self, clip_key, target_sec, variant="native"):
+        """Return `(sec, frame)` stored for `target_sec`, or None."""
+        directory = self._dir(clip_key, variant)
+        prefix = self._prefix(target_sec)
+        try:
+            names = [name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(".npy")]
+        except FileNotFoundError:
+            return None
+        if not names:
+            return None
+        path = os.path.join(directory, names[0])
+        try:
+            frame = np.load(path, mmap_mode="r")
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return int(names[0][len(prefix) + 1:-4]) / 1e6, frame
+
+    def put(self, clip_key, target_sec, sec, frame, variant="native"):
+        directory = self._dir(clip_key, variant)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self._prefix(target_sec)}p{round(sec * 1e6)}.npy")
+        _atomic_write(path, lambda f: np.save(f, frame))
+        self.added()
+
+    def added(self, count=1):
+        """Count frames put into the store (here or by another process); sweep every EVICT_EVERY.
+
+        Worker processes get their own copy of the store, so whoever
+        collects their results reports the frames they added here.
+        """
+        self._puts += count
+        if self._puts >= EVICT_EVERY:
+            self._puts = 0
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used frames until the store fits in `max_bytes`."""
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".npy"):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
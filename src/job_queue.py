@@ -0,0 +1,214 @@
+"""
+SQLite job queue shared by every process working on one analysis run.
+
+A coordinator adds one job per clip; workers claim jobs under a lease,
+renew their leases with heartbeats while they work, and store each clip's
+result exactly once. A lease that is not renewed (the worker crashed or
+hung) expires and the job goes back to the queue, up to `max_attempts`.
+Once the queue drains, one process claims the right to write the output.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from .config import QUEUE_LEASE_SEC, QUEUE_HEARTBEAT_SEC, QUEUE_MAX_ATTEMPTS
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """Clip jobs with leases, retry counts and idempotent results.
+
+    Job states: pending -> leased -> done, or back to pending when a lease
+    expires or a worker reports a failure, and finally failed once
+    `max_attempts` claims have not produced a result. Safe to share between
+    threads (one connection per thread) and processes (SQLite WAL locking;
+    claims take the write lock, so two workers never get the same job).
+    """
+
+    def __init__(self, path, lease_sec=QUEUE_LEASE_SEC, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    lease_expires REAL,
+                    error TEXT
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, lease_expires)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    job_id TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    finished REAL NOT NULL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS finalized (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    owner TEXT NOT NULL,
+                    finished REAL NOT NULL
+                )""")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, so claim() can take the write lock up front
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, jobs):
+        """Enqueue `(job_id, payload)` pairs; ids already queued are skipped. Returns the number added."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO jobs (id, payload) VALUES (?, ?)",
+                             ((job_id, json.dumps(payload)) for job_id, payload in jobs))
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, owner):
+        """Lease the next runnable job to `owner`; returns `(job_id, payload, attempt)` or None."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases that have used up their attempts are given up on
+            conn.execute("""
+                UPDATE jobs SET status = 'failed', owner = NULL, error = coalesce(error, 'lease expired')
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""", (now, self.max_attempts))
+            row = conn.execute("""
+                SELECT id, payload, attempts FROM jobs
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY rowid LIMIT 1""", (now,)).fetchone()
+            if row is not None:
+                conn.execute("""
+                    UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1
+                    WHERE id = ?""", (owner, now + self.lease_sec, row[0]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2] + 1
+
+    def heartbeat(self, owner):
+        """Extend every lease held by `owner`; returns how many were renewed."""
+        conn = self._conn()
+        cursor = conn.execute("UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status = 'leased'",
+                              (time.time() + self.lease_sec, owner))
+        return cursor.rowcount
+
+    def complete(self, job_id, owner, result):
+        """Store the result of `job_id` and mark it done.
+
+        Idempotent: if another worker already stored a result (e.g. after
+        this worker's lease expired), the first one is kept. Returns True
+        if this call stored it.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = conn.execute("INSERT OR IGNORE INTO results (job_id, result, owner, finished) VALUES (?, ?, ?, ?)",
+                                  (job_id, json.dumps(result), owner, time.time())).rowcount == 1
+            conn.execute("UPDATE jobs SET status = 'done', owner = NULL, lease_expires = NULL WHERE id = ?", (job_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    def fail(self, owner, error, job_id=None):
+        """Give back `owner`'s leases (or just `job_id`) after an error.
+
+        Jobs with attempts left return to pending, the rest are marked failed.
+        """
+        conn = self._conn()
+        where = "owner = ? AND status = 'leased'" + (" AND id = ?" if job_id else "")
+        args = (owner, job_id) if job_id else (owner,)
+        conn.execute(f"""
+            UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                            owner = NULL, lease_expires = NULL, error = ?
+            WHERE {where}""", (self.max_attempts, str(error)) + args)
+
+    def counts(self):
+        """Number of jobs per status."""
+        rows = self._conn().execute("SELECT status, count(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def drained(self):
+        """True once no job is pending or leased."""
+        counts = self.counts()
+        return not counts.get("pending") and not counts.get("leased")
+
+    def claim_finalize(self, owner):
+        """True for exactly one caller, once the queue is drained: the one that writes the run's output.
+
+        Several workers can see the queue drain at the same moment; the
+        claim and the drained check share one write transaction.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            busy = conn.execute("SELECT count(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()[0]
+            claimed = not busy and conn.execute(
+                "INSERT OR IGNORE INTO finalized (id, owner, finished) VALUES (1, ?, ?)",
+                (owner, time.time())).rowcount == 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def results(self):
+        """Yield stored results in enqueue order."""
+        rows = self._conn().execute("""
+            SELECT results.result FROM results JOIN jobs ON jobs.id = results.job_id
+            ORDER BY jobs.rowid""")
+        for (result,) in rows:
+            yield json.loads(result)
+
+
+class Heartbeat:
+    """Background thread renewing `owner`'s leases every `interval` seconds."""
+
+    def __init__(self, queue, owner, interval=QUEUE_HEARTBEAT_SEC):
+        self.queue = queue
+        self.owner = owner
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.queue.heartbeat(self.owner)
@@ -0,0 +1,212 @@
+"""
+Real-time analysis of a live video feed (RTSP/HTTP stream, or a local file
+replayed at real-time pace).
+
+A capture thread decodes the feed as it arrives, keeps one frame every
+1/`sample_fps` seconds of video, encodes it and puts it in a small ring
+buffer. Whenever one of the `max_in_flight` analysis slots frees up, the
+freshest buffered frame is sent; older frames are dropped, never queued.
+Memory is bounded by the ring plus the frames in flight, and the analysis
+rate adapts to what the API can sustain instead of falling behind.
+"""
+import os
+import threading
+import time
+
+import av
+
+from .config import LIVE_SAMPLE_FPS, LIVE_RING_SIZE, LIVE_MAX_IN_FLIGHT, DECODE_THREAD_TYPE
+from .metrics import metrics
+from .vision_analyzer import encode_video_frame, DEFAULT_PROMPT
+
+
+class FrameRing:
+    """The `capacity` most recent frames; putting into a full ring drops the oldest."""
+
+    def __init__(self, capacity=LIVE_RING_SIZE):
+        self.capacity = capacity
+        self._items = []
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            self._items.append(item)
+            del self._items[:-self.capacity]
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def latest(self, after_seq=-1):
+        """Block until a frame newer than `after_seq` arrives and return the newest one.
+
+        Returns None once the ring is closed and holds nothing newer.
+        """
+        with self._cond:
+            while not self._items or self._items[-1]["seq"] <= after_seq:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            return self._items[-1]
+
+
+class LiveFeed:
+    """Analyzes the freshest frame of `source` whenever an analysis slot is free.
+
+    `engine` is an AnalysisEngine. `realtime` paces decoding to the video
+    timestamps, which a recorded file needs to behave like a live feed;
+    it defaults to True for local files. `options` are passed to libav
+    when opening the source (e.g. `{"rtsp_transport": "tcp"}`).
+    """
+
+    def __init__(self, source, engine, prompt=DEFAULT_PROMPT, sample_fps=LIVE_SAMPLE_FPS,
+                 ring_size=LIVE_RING_SIZE, max_in_flight=LIVE_MAX_IN_FLIGHT, realtime=None, options=None):
+        self.source = source
+        self.engine = engine
+        self.prompt = prompt
+        self.sample_fps = sample_fps
+        self.max_in_flight = max_in_flight
+        self.realtime = os.path.exists(source) if realtime is None else realtime
+        self.options = options
+        self.ring = FrameRing(ring_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+        self._clock = None  # wall-clock time (monotonic) of video time 0
+        self._started = None
+        self._stats = {"frames_decoded": 0, "frames_sampled": 0, "analyzed": 0, "dropped": 0,
+                       "errors": 0, "lag_sec": None, "max_lag_sec": 0.0, "latency_sum": 0.0}
+        self.capture_error = None
+
+    def stop(self):
+        self._stop.set()
+        self.ring.close()
+
+    def _capture(self):
+        try:
+            container = av.open(self.source, options=self.options or {})
+        except Exception as e:
+            self.capture_error = e
+            self.ring.close()
+            return
+        try:
+            stream = container.streams.video[0]
+            stream.thread_type = DECODE_THREAD_TYPE
+            start = stream.start_time or 0
+            interval = 1 / self.sample_fps
+            next_sec = 0.0
+            seq = 0
+            for frame in container.decode(stream):
+                if self._stop.is_set():
+                    break
+                if frame.pts is None:
+                    continue
+                sec = float((frame.pts - start) * stream.time_base)
+                if self._clock is None:
+                    self._clock = time.monotonic() - sec
+                if self.realtime:
+                    delay = self._clock + sec - time.monotonic()
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                self._stats["frames_decoded"] += 1
+                # The tolerance stops float rounding (0.1 + 0.2 > 0.3) from skipping a due frame
+                if sec < next_sec - 1e-6:
+                    continue  # not converted at all, which keeps full-rate decoding cheap
+                next_sec = sec + interval
+                self.ring.put({"seq": seq, "sec": sec, "captured": time.monotonic(),
+                               "b64": encode_video_frame(frame)})
+                self._stats["frames_sampled"] += 1
+                seq += 1
+        except Exception as e:
+            self.capture_error = e
+        finally:
+            container.close()
+            self.ring.close()
+
+    def _finish(self, future, item, on_decision, slots):
+        try:
+            now = time.monotonic()
+            latency = now - item["captured"]
+            lag = now - (self._clock + item["sec"])
+            decision = {"type": "decision", "sec": round(item["sec"], 3), "time": time.time(),
+                        "latency_sec": round(latency, 3), "lag_sec": round(lag, 3)}
+            error = future.exception()
+            if error is not None:
+                decision["error"] = str(error)
+            else:
+                result = future.result()
+                decision.update(analysis=result["description"], cost_usd=result["cost_usd"])
+            metrics.observe("live_latency", latency)
+            metrics.observe("live_lag", lag)
+            with self._lock:
+                self._stats["analyzed" if error is None else "errors"] += 1
+                self._stats["latency_sum"] += latency
+                self._stats["lag_sec"] = round(lag, 3)
+                self._stats["max_lag_sec"] = round(max(self._stats["max_lag_sec"], lag), 3)
+            with self._emit_lock:
+                on_decision(decision)
+        finally:
+            slots.release()
+
+    def run(self, on_decision, duration=None):
+        """Analyze until the feed ends, `duration` seconds pass or `stop()` is called.
+
+        `on_decision(decision)` is called once per analyzed frame, one call
+        at a time, with the video time `sec`, `analysis` (or `error`),
+        `latency_sec` from capture to decision and `lag_sec` behind the
+        live edge of the feed. Returns `stats()`.
+        """
+        self._started = time.monotonic()
+        capture = threading.Thread(target=self._capture, daemon=True)
+        capture.start()
+        timer = None
+        if duration is not None:
+            timer = threading.Timer(duration, self.stop)
+            timer.daemon = True
+            timer.start()
+
+        slots = threading.Semaphore(self.max_in_flight)
+        last_seq = -1
+        while True:
+            slots.acquire()
+            item = None if self._stop.is_set() else self.ring.latest(last_seq)
+            if item is None or self._stop.is_set():
+                slots.release()
+                break
+            dropped = item["seq"] - last_seq - 1
+            if dropped:
+                metrics.inc("live_frames_dropped", dropped)
+                with self._lock:
+                    self._stats["dropped"] += dropped
+            last_seq = item["seq"]
+            future = self.engine.submit_many([item["b64"]], self.prompt, encoded=True)[0]
+            future.add_done_callback(lambda f, item=item: self._finish(f, item, on_decision, slots))
+
+        for _ in range(self.max_in_flight):
+            slots.acquire()  # wait for the frames still in flight
+        self.stop()
+        capture.join()
+        unsent = self._stats["frames_sampled"] - 1 - last_seq
+        if unsent > 0:
+            metrics.inc("live_frames_dropped", unsent)
+            self._stats["dropped"] += unsent
+        if timer is not None:
+            timer.cancel()
+        return self.stats()
+
+    def stats(self):
+        """Counts so far, the achieved analysis rate and the current and worst lag."""
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        done = stats["analyzed"] + stats["errors"]
+        latency_sum = stats.pop("latency_sum")
+        stats.update(
+            elapsed_sec=round(elapsed, 3),
+            analysis_rate=round(done / elapsed, 3) if elapsed else None,
+            mean_latency_sec=round(latency_sum / done, 3) if done else None,
+        )
+        return stats
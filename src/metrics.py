@@ -0,0 +1,130 @@
+"""
+Lightweight per-stage instrumentation: counters and latency histograms.
+
+Modules record into the process-wide `metrics` object; worker processes
+send their `snapshot()` back to be `merge()`d. A run ends with
+`write_json()` and/or `write_prometheus()` (node-exporter textfile format).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self.histograms.setdefault(stage, {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)})
+            hist["count"] += 1
+            hist["sum"] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += 1
+                    break
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {k: dict(v, buckets=list(v["buckets"])) for k, v in self.histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def merge(self, snapshot):
+        """Add another process's snapshot into this one."""
+        with self._lock:
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for stage, other in snapshot["histograms"].items():
+                hist = self.histograms.setdefault(stage, {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS)})
+                hist["count"] += other["count"]
+                hist["sum"] += other["sum"]
+                hist["buckets"] = [a + b for a, b in zip(hist["buckets"], other["buckets"])]
+
+    @staticmethod
+    def _quantile(hist, q):
+        """Upper bound of the bucket holding the q-quantile."""
+        target = q * hist["count"]
+        seen = 0
+        for bound, n in zip(BUCKETS, hist["buckets"]):
+            seen += n
+            if seen >= target:
+                return bound
+        return BUCKETS[-1]
+
+    def summary(self):
+        snap = self.snapshot()
+        elapsed = time.time() - self.started
+        stages = {}
+        for stage, hist in snap["histograms"].items():
+            stages[stage] = {
+                "count": hist["count"],
+                "total_sec": round(hist["sum"], 3),
+                "mean_sec": round(hist["sum"] / hist["count"], 4) if hist["count"] else None,
+                "p50_le_sec": self._quantile(hist, 0.5),
+                "p95_le_sec": self._quantile(hist, 0.95),
+                "p99_le_sec": self._quantile(hist, 0.99),
+            }
+        counters = snap["counters"]
+        return {
+            "elapsed_sec": round(elapsed, 3),
+            "counters": counters,
+            "stages": stages,
+            "frames_per_sec": round(counters.get("frames_decoded", 0) / elapsed, 3) if elapsed else None,
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2, default=str)
+
+    def write_prometheus(self, path, prefix="egocentric"):
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for stage, hist in sorted(snap["histograms"].items()):
+            metric = f"{prefix}_stage_seconds"
+            cumulative = 0
+            for bound, n in zip(BUCKETS, hist["buckets"]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {hist["sum"]}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {hist["count"]}')
+        if snap["histograms"]:
+            lines.insert(2 * len(snap["counters"]), f"# TYPE {prefix}_stage_seconds histogram")
+        # Textfile collectors read whole files, so write atomically
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` tokens/min.
+
+    The balance may go negative after `adjust()` so that under-estimated
+    requests are paid back by delaying later ones.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, then take them."""
+        # A single request larger than the bucket could never fit; let it
+        # through once the bucket is full and carry the rest as debt.
+        need = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= need:
+                    self._tokens -= amount
+                    return
+                wait = (need - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, delta):
+        """Charge (positive) or refund (negative) tokens after the fact."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits plus a shared pause.
+
+    `pause()` is used when the server answers 429 / Retry-After so that
+    every worker backs off, not just the one that got rejected.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _wait_for_resume(self):
+        while True:
+            with self._lock:
+                wait = self._resume_at - time.monotonic()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def acquire(self, est_tokens):
+        self._wait_for_resume()
+        self.requests.acquire(1)
+        self.tokens.acquire(est_tokens)
+
+    def settle(self, est_tokens, actual_tokens):
+        """Correct the token bucket once real usage is known."""
+        self.tokens.adjust(actual_tokens - est_tokens)
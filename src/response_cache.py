@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .metrics import metrics
+from .config import MODEL, MAX_TOKENS, IMAGE_DETAIL, CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_MAX_AGE_DAYS
+
+EVICT_EVERY = 100  # puts between eviction sweeps
+
+
+def cache_key(b64, prompt, model=MODEL, max_tokens=MAX_TOKENS, detail=IMAGE_DETAIL):
+    """Content address for one request: encoded image + prompt + model params."""
+    h = hashlib.sha256()
+    for part in (model, str(max_tokens), detail, prompt, b64):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """Persistent SQLite cache of vision responses with LRU/age eviction.
+
+    Safe to share between threads (one connection per thread) and between
+    processes (SQLite WAL locking). Hits and misses are counted so callers
+    can report a hit rate next to the cost.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, max_age_days=CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_sec = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key):
+        """Return the cached result for `key` (marked `cached`), or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT result FROM responses WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                metrics.inc("cache_misses")
+                return None
+            self.hits += 1
+        metrics.inc("cache_hits")
+        with conn:
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        result = json.loads(row[0])
+        result["cost_usd"] = 0.0
+        result["cached"] = True
+        return result
+
+    def put(self, key, result):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, result, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now),
+            )
+        with self._lock:
+            self._puts += 1
+            sweep = self._puts % EVICT_EVERY == 0
+        if sweep:
+            self.evict()
+
+    def evict(self):
+        """Drop entries older than the age limit, then least-recently-used overflow."""
+        conn = self._conn()
+        with conn:
+            if self.max_age_sec:
+                conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_sec,))
+            if self.max_entries:
+                conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )""", (self.max_entries,))
@@ -0,0 +1,175 @@
+"""
+Queryable store of analysis results: SQLite with an FTS5 index on the text.
+
+Every frame is a row keyed by run, clip, factory, worker and timestamp;
+the pipeline only ever appends. Filtered and full-text queries ("frames
+from factory 3 mentioning gloves") are index lookups, not a scan of a
+JSON file.
+
+Run: python -m src.result_store [--run ID] [--factory N] [--worker N] [--clip KEY] [text query]
+     python -m src.result_store --runs
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import RESULT_STORE_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE,
+    started REAL NOT NULL,
+    source TEXT NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clips (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    clip TEXT NOT NULL,
+    factory_id INTEGER,
+    worker_id INTEGER,
+    duration_sec REAL,
+    cost_usd REAL,
+    PRIMARY KEY (run_id, clip)
+);
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    clip TEXT NOT NULL,
+    factory_id INTEGER,
+    worker_id INTEGER,
+    frame_idx INTEGER,
+    sec REAL,
+    analysis TEXT,
+    deduped_from TEXT,
+    error TEXT,
+    UNIQUE (run_id, clip, frame_idx)
+);
+CREATE INDEX IF NOT EXISTS frames_factory_worker ON frames(factory_id, worker_id, sec);
+CREATE INDEX IF NOT EXISTS frames_clip ON frames(clip, sec);
+CREATE VIRTUAL TABLE IF NOT EXISTS frames_fts USING fts5(analysis, content='frames', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS frames_fts_insert AFTER INSERT ON frames BEGIN
+    INSERT INTO frames_fts(rowid, analysis) VALUES (new.id, new.analysis);
+END;
+"""
+
+
+class ResultStore:
+    """Append-only SQLite store of per-frame results, grouped into runs.
+
+    Safe to share between threads (one connection per thread) and between
+    processes (SQLite WAL locking). Re-adding a clip to the same run (e.g.
+    after a resume) is a no-op per frame.
+    """
+
+    def __init__(self, path=RESULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def start_run(self, source, name=None, **meta):
+        """Register a run (`source` is e.g. "main" or "app"); returns its id.
+
+        A named run is created once: later calls with the same `name`
+        return the existing id, so several processes can share it.
+        """
+        with self._conn() as conn:
+            conn.execute("INSERT OR IGNORE INTO runs (name, started, source, meta) VALUES (?, ?, ?, ?)",
+                         (name, time.time(), source, json.dumps(meta)))
+            if name is None:
+                return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            return conn.execute("SELECT id FROM runs WHERE name = ?", (name,)).fetchone()[0]
+
+    def add_clip(self, run_id, record):
+        """Append a clip result record (as written to the results log) to a run."""
+        rows = []
+        for i, frame in enumerate(record["frames"]):
+            deduped_from = frame.get("deduped_from")
+            rows.append((
+                run_id, record["key"], record.get("factory_id"), record.get("worker_id"),
+                frame.get("frame_idx", i), frame.get("sec"), frame.get("analysis"),
+                json.dumps(deduped_from) if deduped_from is not None else None, frame.get("error"),
+            ))
+        with self._conn() as conn:
+            conn.execute("""
+                INSERT OR IGNORE INTO clips (run_id, clip, factory_id, worker_id, duration_sec, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (run_id, record["key"], record.get("factory_id"), record.get("worker_id"),
+                 record.get("duration_sec"), record.get("cost_usd")))
+            conn.executemany("""
+                INSERT OR IGNORE INTO frames
+                    (run_id, clip, factory_id, worker_id, frame_idx, sec, analysis, deduped_from, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+
+    def runs(self):
+        """Every run, newest first, with its clip count and cost."""
+        rows = self._conn().execute("""
+            SELECT runs.id, runs.name, runs.started, runs.source, runs.meta,
+                   count(clips.clip) AS clips, coalesce(sum(clips.cost_usd), 0) AS cost_usd
+            FROM runs LEFT JOIN clips ON clips.run_id = runs.id
+            GROUP BY runs.id ORDER BY runs.id DESC""").fetchall()
+        return [dict(row, meta=json.loads(row["meta"])) for row in rows]
+
+    def query(self, text=None, run_id=None, factory_id=None, worker_id=None, clip=None, limit=100):
+        """Frames matching every given filter; `text` is an FTS5 query (e.g. "gloves", "glove*").
+
+        Full-text matches come back best first, other queries in clip and
+        timestamp order.
+        """
+        where, args = [], []
+        for column, value in (("run_id", run_id), ("factory_id", factory_id),
+                              ("worker_id", worker_id), ("clip", clip)):
+            if value is not None:
+                where.append(f"frames.{column} = ?")
+                args.append(value)
+        if text:
+            sql = "SELECT frames.* FROM frames_fts JOIN frames ON frames.id = frames_fts.rowid"
+            where.insert(0, "frames_fts MATCH ?")
+            args.insert(0, text)
+            order = "frames_fts.rank"
+        else:
+            sql = "SELECT frames.* FROM frames"
+            order = "frames.run_id DESC, frames.clip, frames.sec"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        rows = self._conn().execute(sql, args + [limit]).fetchall()
+        return [dict(row, deduped_from=json.loads(row["deduped_from"]) if row["deduped_from"] else None)
+                for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query stored analysis results.")
+    parser.add_argument("text", nargs="*", help="full-text query, FTS5 syntax")
+    parser.add_argument("--run", type=int)
+    parser.add_argument("--factory", type=int)
+    parser.add_argument("--worker", type=int)
+    parser.add_argument("--clip")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", action="store_true", help="list runs instead")
+    args = parser.parse_args()
+
+    store = ResultStore()
+    if args.runs:
+        for run in store.runs():
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["started"]))
+            print(f"#{run['id']}  {started}  {run['source']:<5} {run['clips']} clip(s), ${run['cost_usd']:.4f}")
+    else:
+        for frame in store.query(" ".join(args.text) or None, args.run, args.factory, args.worker, args.clip, args.limit):
+            print(f"#{frame['run_id']} {frame['clip']} @ {frame['sec']}s (factory {frame['factory_id']}, "
+                  f"worker {frame['worker_id']}): {frame['analysis'] or frame['error']}")
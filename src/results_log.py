@@ -0,0 +1,80 @@
+import json
+import os
+
+CHECKPOINT_EVERY = 10  # clip lines between fsyncs
+
+
+class ResultsLog:
+    """Append-only JSONL results file for long batch runs.
+
+    Every record is written and flushed as soon as it is complete, and the
+    file is fsynced every `checkpoint_every` records, so a crash loses at
+    most the clips still in flight. A torn last line from an earlier crash
+    is dropped when the log is reopened. With a `store` (ResultStore),
+    every clip record is also appended to run `run_id` there.
+    """
+
+    def __init__(self, path, checkpoint_every=CHECKPOINT_EVERY, store=None, run_id=None):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.store = store
+        self.run_id = run_id
+        self._written = 0
+        _drop_partial_line(path)
+        self._file = open(path, "a")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self._written += 1
+        if self._written % self.checkpoint_every == 0:
+            self.checkpoint()
+        if self.store is not None and record.get("type") == "clip":
+            self.store.add_clip(self.run_id, record)
+
+    def checkpoint(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.checkpoint()
+            self._file.close()
+
+
+def _drop_partial_line(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_log(path):
+    """Yield the complete records of a results log (none if it does not exist)."""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+
+def compact(log_path, json_path):
+    """Write the aggregated JSON array of clip results from a results log."""
+    clips = [
+        {k: v for k, v in record.items() if k != "type"}
+        for record in read_log(log_path) if record.get("type") == "clip"
+    ]
+    tmp_path = f"{json_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(clips, f, indent=2)
+    os.replace(tmp_path, json_path)
+    return len(clips)
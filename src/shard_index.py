@@ -0,0 +1,205 @@
+"""
+Byte-range index of Egocentric-10K tar shards.
+
+Reads only the 512-byte tar headers (plus the small JSON members) with
+Range requests, so a single clip can later be fetched with one GET or
+decoded in place through a RangeFile.
+
+Run: python -m src.shard_index <tar_url> [<tar_url> ...]
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
+
+import requests
+
+from .config import HF_TOKEN, SHARD_INDEX_DIR, RANGE_BLOCK_SIZE
+
+TAR_BLOCK = 512
+HEADER_READ_SIZE = 16 * 1024  # one request covers a header and a small JSON member
+
+
+def auth_headers():
+    return {"Authorization": f"Bearer {HF_TOKEN}"} if HF_TOKEN else {}
+
+
+class RangeFile(io.RawIOBase):
+    """Read-only, seekable file over HTTP Range requests.
+
+    `offset`/`size` restrict the view to one byte range of the remote file
+    (e.g. a single tar member). Reads are served from a read-ahead block of
+    `block_size` bytes, so PyAV's small sequential reads and seeks cost one
+    request per block rather than one per read.
+    """
+
+    def __init__(self, url, offset=0, size=None, headers=None, session=None, block_size=RANGE_BLOCK_SIZE):
+        self.session = session or requests.Session()
+        self.headers = auth_headers() if headers is None else headers
+        self.block_size = block_size
+        self.url = url
+        if size is None or url.startswith("https://huggingface.co/"):
+            # Resolve redirects once (HF -> CDN) and learn the size.
+            head = self.session.head(url, headers=self.headers, allow_redirects=True, timeout=60)
+            head.raise_for_status()
+            self.url = head.url
+            if size is None:
+                size = int(head.headers["Content-Length"]) - offset
+        self.offset = offset
+        self.size = size
+        self._pos = 0
+        self._block_start = 0
+        self._block = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self.size
+        if pos < 0:
+            raise ValueError("negative seek position")
+        self._pos = pos
+        return pos
+
+    def fetch(self, start, length):
+        """GET `length` bytes at `start` (relative to this view)."""
+        first = self.offset + start
+        last = first + length - 1
+        response = self.session.get(self.url, headers=dict(self.headers, Range=f"bytes={first}-{last}"), timeout=60)
+        if response.status_code != 206:
+            raise IOError(f"range request failed: HTTP {response.status_code}")
+        return response.content
+
+    def readinto(self, b):
+        """Fill `b` up to the end of the view, fetching as many blocks as that takes.
+
+        Callers such as the tar header parser read once and expect the full
+        length back, even when it crosses a block boundary.
+        """
+        n = 0
+        while n < len(b) and self._pos < self.size:
+            block_end = self._block_start + len(self._block)
+            if not (self._block_start <= self._pos < block_end):
+                self._block_start = self._pos
+                wanted = max(self.block_size, len(b) - n)
+                self._block = self.fetch(self._pos, min(wanted, self.size - self._pos))
+                if not self._block:
+                    break
+                block_end = self._block_start + len(self._block)
+            start = self._pos - self._block_start
+            count = min(len(b) - n, block_end - self._pos)
+            b[n:n + count] = self._block[start:start + count]
+            self._pos += count
+            n += count
+        return n
+
+
+def _parse_pax(data):
+    """Fields of a pax extended header ('length key=value\\n' records)."""
+    fields = {}
+    while data:
+        length = int(data.split(b" ", 1)[0])
+        key, _, value = data[:length].split(b" ", 1)[1].rstrip(b"\n").partition(b"=")
+        fields[key.decode()] = value.decode("utf-8", "surrogateescape")
+        data = data[length:]
+    return fields
+
+
+def _read_members(remote):
+    """Yield `(name, data_offset, size)` for each regular file in the tar."""
+    pos = 0
+    long_name = None
+    pax = {}
+    while pos + TAR_BLOCK <= remote.size:
+        remote.seek(pos)
+        header = remote.read(TAR_BLOCK)
+        try:
+            info = tarfile.TarInfo.frombuf(header, "utf-8", "surrogateescape")
+        except tarfile.EOFHeaderError:
+            return
+        data_offset = pos + TAR_BLOCK
+        size = info.size
+        pos = data_offset + -(-size // TAR_BLOCK) * TAR_BLOCK
+
+        if info.type in (tarfile.GNUTYPE_LONGNAME, tarfile.XHDTYPE):
+            remote.seek(data_offset)
+            data = remote.read(size)
+            if info.type == tarfile.GNUTYPE_LONGNAME:
+                long_name = data.rstrip(b"\0").decode("utf-8", "surrogateescape")
+            else:
+                pax = _parse_pax(data)
+            continue
+        if info.isfile():
+            name = pax.get("path", long_name or info.name)
+            if "size" in pax:
+                size = int(pax["size"])
+                pos = data_offset + -(-size // TAR_BLOCK) * TAR_BLOCK
+            yield name, data_offset, size
+        long_name = None
+        pax = {}
+
+
+def build_index(url, headers=None, session=None):
+    """Index one tar shard: every clip's mp4 offset/size and parsed JSON metadata."""
+    remote = RangeFile(url, headers=headers, session=session, block_size=HEADER_READ_SIZE)
+    clips = {}
+    for name, offset, size in _read_members(remote):
+        key, _, ext = name.rpartition(".")
+        clip = clips.setdefault(key, {"key": key})
+        if ext == "mp4":
+            clip["offset"] = offset
+            clip["size"] = size
+        elif ext == "json":
+            remote.seek(offset)
+            clip["metadata"] = json.loads(remote.read(size))
+    return {
+        "url": url,
+        "size": remote.size,
+        "clips": [clip for clip in clips.values() if "offset" in clip],
+    }
+
+
+def _index_path(url):
+    return os.path.join(SHARD_INDEX_DIR, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+
+def load_index(url, headers=None, session=None, refresh=False):
+    """Load the cached index for `url`, building (and saving) it if missing."""
+    path = _index_path(url)
+    if not refresh and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    index = build_index(url, headers=headers, session=session)
+    os.makedirs(SHARD_INDEX_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+    return index
+
+
+def open_clip(url, clip, headers=None, session=None):
+    """Seekable file over one clip's MP4 bytes inside the shard, for PyAV."""
+    return RangeFile(url, offset=clip["offset"], size=clip["size"], headers=headers, session=session)
+
+
+def fetch_clip(url, clip, headers=None, session=None):
+    """Download one clip's MP4 bytes with a single Range GET."""
+    return open_clip(url, clip, headers=headers, session=session).fetch(0, clip["size"])
+
+
+if __name__ == "__main__":
+    for tar_url in sys.argv[1:]:
+        index = load_index(tar_url, refresh=True)
+        print(f"✓ {tar_url.split('/')[-1]}: {len(index['clips'])} clip(s) indexed")
@@ -1,9 +1,17 @@
+import io
+import itertools
+import json
+import math
+import os
+import queue
 import random
-from datasets import load_dataset
-import av
-from io import BytesIO
-from tqdm import tqdm
-from .config import HF_TOKEN
+import threading
+from pathlib import Path
+from .config import (
+    HF_TOKEN, DATASET_REPO, SHUFFLE_BUFFER_SIZE, PREFETCH_CLIPS,
+    IMAGE_MAX_EDGE, IMAGE_CROP, DECODE_THREAD_TYPE,
+)
+from .metrics import metrics
 
 # Cache the dataset connection to avoid reloading
 _dataset_cache = None
@@ -12,28 +20,293 @@ def get_dataset():
     """Lazy load and cache the dataset connection."""
     global _dataset_cache
     if _dataset_cache is None:
+        from datasets import load_dataset  # slow to import; only streaming needs it
         _dataset_cache = load_dataset(
-            "builddotai/Egocentric-10K",
+            DATASET_REPO,
             streaming=True,
             split="train",
             token=HF_TOKEN
         )
     return _dataset_cache
 
-def stream_random_clips(n=5):
+class _Raised:
+    def __init__(self, error):
+        self.error = error
+
+def prefetch(iterable, depth=PREFETCH_CLIPS):
+    """Iterate `iterable` on a background thread, keeping at most `depth` items ready.
+
+    Lets the consumer work on item i while item i+1 is being fetched.
+    Errors from the producer are re-raised in the consumer; closing the
+    generator early stops the producer.
+    """
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Raised(e))
+        put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = ready.get()
+            if item is done:
+                return
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+def stream_random_clips(n=5, prefetch_depth=PREFETCH_CLIPS, seed=None):
+    """Lazily yield `n` distinct random clips, prefetching `prefetch_depth` ahead.
+
+    Randomness comes from the shard-order shuffle plus a small sample
+    buffer, so only a handful of clips are ever held in memory. The same
+    `seed` yields the same clips in the same order.
+    """
     ds = get_dataset()
-    ds = ds.shuffle(buffer_size=1000, seed=random.randint(0, 10000))
-    return [next(iter(ds)) for _ in range(n)]
-
-def extract_frames(mp4_bytes, interval_sec=10, max_frames=3):
-    container = av.open(BytesIO(mp4_bytes))
-    frames = []
-    target_pts = 0
-    fps = container.streams.video[0].average_rate
-
-    for frame in container.decode(video=0):
-        current_sec = frame.pts * fps.denominator / fps.numerator
-        if current_sec >= target_pts and len(frames) < max_frames:
-            frames.append(frame.to_rgb().to_ndarray())
-            target_pts += interval_sec
-    return frames
+    if seed is None:
+        seed = random.randint(0, 10000)
+    ds = ds.shuffle(buffer_size=SHUFFLE_BUFFER_SIZE, seed=seed)
+    return prefetch(_timed_download(itertools.islice(ds, n)), prefetch_depth)
+
+def _timed_download(clips):
+    """Record the time spent fetching each clip and its size."""
+    clips = iter(clips)
+    while True:
+        with metrics.timer("download"):
+            clip = next(clips, None)
+        if clip is None:
+            return
+        metrics.inc("clips_downloaded")
+        metrics.inc("bytes_downloaded", len(clip["mp4"]))
+        yield clip
+
+def local_clips(clips_dir, n=None):
+    """Yield clips saved by the preload scripts (clip_XX.mp4 + clip_XX.json).
+
+    Samples have the same shape as dataset samples, but `mp4` is a path,
+    so the video is decoded straight from disk.
+    """
+    for mp4_path in sorted(Path(clips_dir).glob("*.mp4"))[:n]:
+        with open(mp4_path.with_suffix(".json")) as f:
+            meta = json.load(f)
+        yield {"__key__": mp4_path.stem, "json": meta, "mp4": str(mp4_path)}
+
+def sample_key(clip):
+    """Stable identifier of a dataset sample (its WebDataset key).
+
+    A sample without one is keyed by the content of its MP4 (as in the
+    frame store); the key is saved as its `__key__` so it outlives the MP4.
+    """
+    if "__key__" not in clip:
+        from .frame_store import content_key  # imports numpy; rarely needed
+
+        key = content_key(clip["mp4"])
+        if key is None:
+            raise ValueError("sample has neither a __key__ nor MP4 content to key it by")
+        clip["__key__"] = f"clip_{key}"
+    return clip["__key__"]
+
+class BufferReader(io.RawIOBase):
+    """Read-only, seekable file object over a bytes-like buffer.
+
+    Wraps bytes, bytearray, memoryview or mmap without copying, so PyAV
+    reads straight out of the caller's buffer.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b):
+        end = min(self._pos + len(b), len(self._view))
+        n = max(end - self._pos, 0)
+        b[:n] = self._view[self._pos:end]
+        self._pos += n
+        return n
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+def open_video(source):
+    """Open a video container without copying it into the Python heap.
+
+    `source` may be a filesystem path, a bytes-like object (bytes,
+    memoryview, mmap) or an already-open seekable binary file object.
+    """
+    import av  # slow to import; only decoding needs it
+
+    if isinstance(source, (str, os.PathLike)):
+        return av.open(os.fspath(source))
+    if isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, "madvise"):
+        return av.open(BufferReader(source))
+    return av.open(source)
+
+def _duration_sec(container, stream):
+    """Best-effort clip duration in seconds."""
+    if stream.duration is not None:
+        return float(stream.duration * stream.time_base)
+    if container.duration is not None:
+        import av
+
+        return container.duration / av.time_base
+    return 0.0
+
+def frame_timestamps(duration_sec, interval_sec=10, max_frames=None, start_sec=0):
+    """Target timestamps every `interval_sec` seconds, capped at `max_frames`."""
+    timestamps = []
+    t = start_sec
+    while t < duration_sec and (max_frames is None or len(timestamps) < max_frames):
+        timestamps.append(t)
+        t += interval_sec
+    return timestamps
+
+def decode_max_edge(max_edge=IMAGE_MAX_EDGE, crop=IMAGE_CROP):
+    """Smallest long edge to decode at that loses nothing in `preprocess_frame`.
+
+    A fractional centre crop shrinks with the frame, so the decode size
+    grows to make up for it; a pixel ROI needs the source size (None).
+    """
+    if not max_edge or (crop is not None and not isinstance(crop, (int, float))):
+        return None
+    return math.ceil(max_edge / crop) if crop else max_edge
+
+def frame_to_ndarray(frame, max_edge=None, format="rgb24"):
+    """Convert a decoded frame to an ndarray, at most `max_edge` pixels on the long edge.
+
+    libav scales and converts colour in a single pass straight from the
+    decoder's YUV planes, so no full-resolution RGB copy is ever made.
+    """
+    width, height = frame.width, frame.height
+    if max_edge and max(width, height) > max_edge:
+        scale = max_edge / max(width, height)
+        width, height = max(1, round(width * scale)), max(1, round(height * scale))
+    return frame.reformat(width=width, height=height, format=format, interpolation="AREA").to_ndarray()
+
+def _seek_frame(container, stream, target_sec):
+    """Seek to the keyframe before `target_sec`, then decode forward to it.
+
+    Returns `(pts_sec, frame)` for the first frame at or after the target,
+    or None if the target lies past the end of the stream.
+    """
+    time_base = stream.time_base
+    target_pts = (stream.start_time or 0) + int(target_sec / time_base)
+    container.seek(target_pts, stream=stream, backward=True, any_frame=False)
+    for frame in container.decode(stream):
+        if frame.pts is None or frame.pts < target_pts:
+            continue
+        return float((frame.pts - (stream.start_time or 0)) * time_base), frame
+    return None
+
+def extract_frames(source, interval_sec=10, max_frames=3, timestamps=None, store=None, clip_key=None,
+                   reduced=True, decode_threads=0):
+    """Sample frames by timestamp seek instead of decoding the whole clip.
+
+    `source` is anything `open_video` accepts; pass a path or mmap for
+    large clips so the file is never read into memory as a whole. Pass
+    `timestamps` (seconds) to choose the sample points explicitly;
+    otherwise one frame is taken every `interval_sec` seconds, up to
+    `max_frames` (None means the full clip). Returns a list of
+    `(sec, frame)` tuples, where `sec` is the real presentation time of
+    the RGB ndarray `frame`.
+
+    With a `store` (FrameStore), frames already decoded for this clip are
+    served from disk and new ones are added to it; `clip_key` overrides
+    the content key for sources the store cannot hash itself.
+
+    Frames are decoded straight to the size that `encode_frame` keeps
+    (`decode_max_edge()`); pass `reduced=False` for full-resolution frames.
+    `decode_threads` caps libav's decoder threads (0 lets libav choose).
+    """
+    max_edge = decode_max_edge() if reduced else None
+    # Frames of each decode size are stored apart, so a size change never serves the wrong one
+    variant = "native" if max_edge is None else f"max{max_edge}"
+    key = None
+    if store is not None:
+        key = clip_key or store.clip_key(source)
+    if key is not None:
+        if timestamps is None:
+            duration = store.duration(key)
+            if duration is not None:
+                timestamps = frame_timestamps(duration, interval_sec, max_frames)
+        if timestamps is not None:
+            cached = [store.get(key, t, variant) for t in sorted(set(timestamps))]
+            if all(hit is not None for hit in cached):
+                metrics.inc("frame_store_hits", len(cached))
+                return cached
+
+    container = open_video(source)
+    try:
+        stream = container.streams.video[0]
+        stream.thread_type = DECODE_THREAD_TYPE
+        stream.thread_count = decode_threads
+        duration = _duration_sec(container, stream)
+        if key is not None:
+            store.set_duration(key, duration)
+        if timestamps is None:
+            timestamps = frame_timestamps(duration, interval_sec, max_frames)
+
+        frames = []
+        for target_sec in sorted(set(timestamps)):
+            hit = store.get(key, target_sec, variant) if key is not None else None
+            if hit is not None:
+                metrics.inc("frame_store_hits")
+                frames.append(hit)
+                continue
+            with metrics.timer("decode"):
+                found = _seek_frame(container, stream, target_sec)
+                if found is not None:
+                    sec, frame = found
+                    frame = frame_to_ndarray(frame, max_edge)
+            if found is None:
+                break
+            metrics.inc("frames_decoded")
+            frames.append((sec, frame))
+            if key is not None:
+                store.put(key, target_sec, *frames[-1], variant=variant)
+                metrics.inc("frame_store_puts")
+        return frames
+    finally:
+        container.close()
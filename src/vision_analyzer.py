@@ -1,35 +1,272 @@
-import openai
 import base64
+import json
+import math
+import struct
+import threading
 import cv2
 import numpy as np
-from .config import MODEL, MAX_TOKENS, COST_PER_1K_TOKENS_INPUT, COST_PER_1K_TOKENS_OUTPUT
+from .config import (
+    MODEL, MAX_TOKENS, COST_PER_TOKEN_INPUT, COST_PER_TOKEN_OUTPUT,
+    IMAGE_DETAIL, IMAGE_MAX_EDGE, IMAGE_CROP, JPEG_QUALITY,
+)
+from .stream_sampler import frame_to_ndarray, decode_max_edge
+from .metrics import metrics
 
-client = openai.OpenAI()
+_client = None
+_engine = None
+_client_lock = threading.Lock()
 
-def encode_frame(frame):
-    _, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-    return base64.b64encode(buffer).decode()
+def get_client():
+    """The shared OpenAI client, created on first use.
 
-def analyze_frame(frame, prompt="Describe: worker action, tools, objects, safety gear. Be concise."):
-    b64 = encode_frame(frame)
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[{
+    One client (and its HTTP connection pool) serves every thread, so
+    importing this module needs neither the SDK import nor an API key.
+    The SDK's own retries are off: AnalysisEngine retries through the
+    rate limiter, and SDK retries would bypass it.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+                _client = openai.OpenAI(max_retries=0)
+    return _client
+
+DEFAULT_PROMPT = "Describe: worker action, tools, objects, safety gear. Be concise."
+
+# (base tokens, tokens per 512px tile) by model; gpt-4o-mini bills images at ~33x
+IMAGE_TOKEN_COSTS = {"gpt-4o-mini": (2833, 5667)}
+DEFAULT_IMAGE_TOKEN_COST = (85, 170)
+
+def crop_frame(frame, crop=IMAGE_CROP):
+    """Centre-crop to a fraction of each side, or cut an (x, y, w, h) ROI."""
+    if crop is None:
+        return frame
+    if isinstance(crop, (int, float)):
+        h, w = frame.shape[:2]
+        ch, cw = int(h * crop), int(w * crop)
+        y, x = (h - ch) // 2, (w - cw) // 2
+        return frame[y:y + ch, x:x + cw]
+    x, y, w, h = crop
+    return frame[y:y + h, x:x + w]
+
+def preprocess_frame(frame, max_edge=IMAGE_MAX_EDGE, crop=IMAGE_CROP):
+    """Crop, then downscale so the long edge is at most `max_edge` pixels."""
+    frame = crop_frame(frame, crop)
+    h, w = frame.shape[:2]
+    if max_edge and max(h, w) > max_edge:
+        scale = max_edge / max(h, w)
+        frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    return frame
+
+def _jpeg_b64(bgr, quality):
+    _, buffer = cv2.imencode('.jpg', bgr, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    b64 = base64.b64encode(buffer).decode()
+    metrics.inc("frames_encoded")
+    metrics.inc("bytes_encoded", len(b64))
+    return b64
+
+def encode_frame(frame, quality=JPEG_QUALITY):
+    """Preprocess an RGB frame and return it as a base64 JPEG."""
+    with metrics.timer("encode"):
+        frame = preprocess_frame(frame)
+        return _jpeg_b64(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), quality)
+
+def encode_video_frame(frame, quality=JPEG_QUALITY):
+    """Base64 JPEG straight from a decoded `av.VideoFrame`.
+
+    libav scales to `decode_max_edge()` and converts to BGR in one pass,
+    so the only array made is the small one handed to the JPEG encoder.
+    """
+    with metrics.timer("encode"):
+        frame = preprocess_frame(frame_to_ndarray(frame, decode_max_edge(), format="bgr24"))
+        return _jpeg_b64(frame, quality)
+
+def jpeg_size(data):
+    """(width, height) from a JPEG's SOF header, without decoding it."""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 2 if marker != 0xFF else 1
+            continue
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    raise ValueError("no SOF marker in JPEG")
+
+def estimate_image_tokens(width, height, detail=IMAGE_DETAIL, model=MODEL):
+    """Input tokens the API bills for one image (\"auto\" is costed as high)."""
+    base, per_tile = IMAGE_TOKEN_COSTS.get(model, DEFAULT_IMAGE_TOKEN_COST)
+    if detail == "low":
+        return base
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return base + per_tile * math.ceil(width / 512) * math.ceil(height / 512)
+
+def estimate_input_tokens(b64_list, prompt=None):
+    """Estimated input tokens per image of one request, each with its share of the prompt."""
+    prompt_tokens = math.ceil((len(prompt or DEFAULT_PROMPT) // 4 + 10) / max(len(b64_list), 1))
+    return [prompt_tokens + estimate_image_tokens(*jpeg_size(base64.b64decode(b64[:4096]))) for b64 in b64_list]
+
+def estimate_request_tokens(b64_list, prompt=None, max_tokens=MAX_TOKENS):
+    """Upper-bound token estimate for one request, used by the rate limiter."""
+    return sum(estimate_input_tokens(b64_list, prompt)) + max_tokens * len(b64_list)
+
+PACKED_INSTRUCTIONS = (
+    "\n\nYou are given {n} images, numbered 1 to {n} in the order shown. "
+    "Reply with only a JSON array of exactly {n} strings: the description of each image, in order."
+)
+
+class PackedResponseError(ValueError):
+    """A packed reply could not be split into one description per frame.
+
+    Carries the usage of the failed request so callers can still account for it.
+    """
+
+    def __init__(self, message, cost_usd=0.0, tokens=0):
+        super().__init__(message)
+        self.cost_usd = cost_usd
+        self.tokens = tokens
+
+def _image_part(b64):
+    return {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}", "detail": IMAGE_DETAIL}}
+
+def _cost(usage, price_scale=1.0):
+    return price_scale * (
+        (usage.prompt_tokens * COST_PER_TOKEN_INPUT) +
+        (usage.completion_tokens * COST_PER_TOKEN_OUTPUT)
+    )
+
+def frame_request(b64, prompt=DEFAULT_PROMPT):
+    """Chat-completion parameters for one frame, minus the model."""
+    return {
+        "messages": [{
             "role": "user",
             "content": [
                 {"type": "text", "text": prompt},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}}
+                _image_part(b64)
             ]
         }],
-        max_tokens=MAX_TOKENS
-    )
+        "max_tokens": MAX_TOKENS
+    }
+
+def completion_result(response, price_scale=1.0):
+    """Per-frame result dict from a single-frame chat completion.
+
+    `price_scale` discounts the cost, e.g. 0.5 for Batch API results.
+    """
     usage = response.usage
-    cost = (
-        (usage.prompt_tokens * COST_PER_1K_TOKENS_INPUT) +
-        (usage.completion_tokens * COST_PER_1K_TOKENS_OUTPUT)
-    )
     return {
-        "description": response.choices[0].message.content.strip(),
-        "cost_usd": round(cost, 5),
-        "tokens": usage.total_tokens
+        "description": (response.choices[0].message.content or "").strip(),
+        "cost_usd": round(_cost(usage, price_scale), 7),
+        "tokens": usage.total_tokens,
+        "input_tokens": usage.prompt_tokens,
+        "output_tokens": usage.completion_tokens,
+        "cached": False
     }
+
+def _create(messages, max_tokens, images, est_input_tokens=0):
+    """One chat completion, recorded under the "api" stage with its usage.
+
+    `est_input_tokens` is counted next to the billed prompt tokens, so the
+    estimate can be checked against them.
+    """
+    client = get_client()  # the first call imports the SDK; that is not API time
+    with metrics.timer("api"):
+        response = client.chat.completions.create(model=MODEL, messages=messages, max_tokens=max_tokens)
+    usage = response.usage
+    metrics.inc("api_requests")
+    metrics.inc("images_sent", images)
+    metrics.inc("bytes_uploaded", sum(len(part["image_url"]["url"]) for part in messages[0]["content"]
+                                      if part["type"] == "image_url"))
+    metrics.inc("prompt_tokens", usage.prompt_tokens)
+    metrics.inc("est_input_tokens", est_input_tokens)
+    metrics.inc("completion_tokens", usage.completion_tokens)
+    metrics.inc("cost_usd", _cost(usage))
+    return response
+
+def analyze_encoded(b64, prompt=DEFAULT_PROMPT):
+    """Send one base64 JPEG to the vision model and return description, usage and estimate."""
+    est = estimate_input_tokens([b64], prompt)[0]
+    result = completion_result(_create(images=1, est_input_tokens=est, **frame_request(b64, prompt)))
+    result["est_input_tokens"] = est
+    return result
+
+def _parse_packed(text, n):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("\n") + 1:] if "\n" in text else ""
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"packed reply is not JSON: {e}")
+    if not isinstance(items, list) or len(items) != n:
+        raise ValueError(f"expected a JSON array of {n} descriptions")
+    descriptions = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("description")
+        if not isinstance(item, str):
+            raise ValueError("packed reply contains a non-string description")
+        descriptions.append(item.strip())
+    return descriptions
+
+def analyze_encoded_packed(b64_list, prompt=DEFAULT_PROMPT):
+    """Analyze several base64 JPEGs in one request, one result per frame.
+
+    Usage and cost are split evenly across the frames. Raises
+    PackedResponseError if the reply cannot be parsed.
+    """
+    n = len(b64_list)
+    text = prompt + PACKED_INSTRUCTIONS.format(n=n)
+    estimates = estimate_input_tokens(b64_list, text)
+    response = _create(
+        messages=[{
+            "role": "user",
+            "content": [{"type": "text", "text": text}] + [_image_part(b64) for b64 in b64_list]
+        }],
+        max_tokens=MAX_TOKENS * n,
+        images=n,
+        est_input_tokens=sum(estimates)
+    )
+    usage = response.usage
+    cost = _cost(usage)
+    try:
+        descriptions = _parse_packed(response.choices[0].message.content or "", n)
+    except ValueError as e:
+        raise PackedResponseError(str(e), cost_usd=cost, tokens=usage.total_tokens)
+    return [{
+        "description": description,
+        "cost_usd": round(cost / n, 7),
+        "tokens": usage.total_tokens // n,
+        "input_tokens": usage.prompt_tokens // n,
+        "output_tokens": usage.completion_tokens // n,
+        "est_input_tokens": est,
+        "cached": False
+    } for description, est in zip(descriptions, estimates)]
+
+def get_engine():
+    """The shared AnalysisEngine behind `analyze_frame`, created on first use."""
+    global _engine
+    if _engine is None:
+        with _client_lock:
+            if _engine is None:
+                from .analysis_engine import AnalysisEngine  # imports this module
+                _engine = AnalysisEngine()
+    return _engine
+
+def analyze_frame(frame, prompt=DEFAULT_PROMPT, cache=None):
+    """Analyze an RGB frame, consulting `cache` (a ResponseCache) first if given.
+
+    Goes through the shared engine, so caching, cost accounting, retries
+    and rate limits are the same as for batch runs, across all callers.
+    """
+    return get_engine().submit(frame, prompt, cache=cache).result()
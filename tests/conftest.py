@@ -0,0 +1,94 @@
+import http.server
+import os
+import re
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+class _RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Static files with single-range `Range` support, like the Hub's CDN."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        server = self.server
+        path = os.path.join(server.root, self.path.lstrip("/"))
+        if not os.path.isfile(path):
+            self.send_response(404)
+            self.end_headers()
+            return
+        size = os.path.getsize(path)
+        start, end, status = 0, size - 1, 200
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            status = 206
+        server.requests.append((self.command, self.path, self.headers.get("Range")))
+        self.send_response(status)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if head:
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        if server.cut_after is not None:
+            # Simulate a dropped connection part-way through the body
+            self.wfile.write(data[:server.cut_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def range_server(tmp_path):
+    """`(base_url, server)` serving files from a temporary directory."""
+    root = tmp_path / "www"
+    root.mkdir()
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    server.root = str(root)
+    server.requests = []
+    server.cut_after = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    """Stands in for the OpenAI client; returns the list of models called, one per request."""
+    import src.vision_analyzer as vision_analyzer
+
+    calls = []
+
+    def create(model, messages, max_tokens):
+        calls.append(model)
+        usage = types.SimpleNamespace(prompt_tokens=100, completion_tokens=10, total_tokens=110)
+        message = types.SimpleNamespace(content="worker at a bench")
+        return types.SimpleNamespace(usage=usage, choices=[types.SimpleNamespace(message=message)])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(vision_analyzer, "_client", client)
+    return calls
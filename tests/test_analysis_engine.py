@@ -0,0 +1,76 @@
+import json
+import types
+
+import numpy as np
+import pytest
+
+import src.vision_analyzer as vision_analyzer
+from src.analysis_engine import AnalysisEngine
+from src.metrics import metrics
+from src.vision_analyzer import _parse_packed, encode_frame
+
+
+@pytest.mark.parametrize("text", [
+    '["a", "b"]',
+    '```json\n["a", "b"]\n```',
+    '[{"description": "a"}, {"description": " b "}]',
+])
+def test_parse_packed_accepts_plain_fenced_and_object_replies(text):
+    assert _parse_packed(text, 2) == ["a", "b"]
+
+
+@pytest.mark.parametrize("text", [
+    "The first image shows a worker...",  # not JSON
+    '["only one"]',                       # too short
+    '["a", "b", "c"]',                    # too long
+    '{"1": "a", "2": "b"}',               # not an array
+    '["a", 2]',                           # not a string
+    "```",                                # empty fence
+])
+def test_parse_packed_rejects_malformed_replies(text):
+    with pytest.raises(ValueError):
+        _parse_packed(text, 2)
+
+
+@pytest.fixture
+def packing_client(monkeypatch):
+    """Answers packed requests with `reply(n)` and single-frame requests with "single"."""
+    state = types.SimpleNamespace(reply=lambda n: json.dumps([f"img {i}" for i in range(n)]), images=[])
+
+    def create(model, messages, max_tokens):
+        n = sum(1 for part in messages[0]["content"] if part["type"] == "image_url")
+        state.images.append(n)
+        usage = types.SimpleNamespace(prompt_tokens=100 * n, completion_tokens=10 * n, total_tokens=110 * n)
+        text = state.reply(n) if n > 1 else "single"
+        return types.SimpleNamespace(usage=usage, choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=text))])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(vision_analyzer, "_client", client)
+    return state
+
+
+def frames(n):
+    rng = np.random.default_rng(0)
+    return [encode_frame(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)) for _ in range(n)]
+
+
+def test_packed_request_splits_one_reply_per_frame(packing_client):
+    with AnalysisEngine(pack_size=3) as engine:
+        results = [f.result() for f in engine.submit_many(frames(4), encoded=True)]
+    assert packing_client.images == [3, 1]
+    assert [r["description"] for r in results] == ["img 0", "img 1", "img 2", "single"]
+
+
+@pytest.mark.parametrize("reply", [lambda n: "Sorry, here they are: ...", lambda n: json.dumps(["just one"])])
+def test_unparseable_pack_falls_back_to_one_request_per_frame(packing_client, reply):
+    packing_client.reply = reply
+    failures = metrics.snapshot()["counters"].get("packed_parse_failures", 0)
+    with AnalysisEngine(pack_size=3) as engine:
+        results = [f.result() for f in engine.submit_many(frames(3), encoded=True)]
+
+    assert packing_client.images == [3, 1, 1, 1]
+    assert [r["description"] for r in results] == ["single"] * 3
+    assert metrics.snapshot()["counters"]["packed_parse_failures"] == failures + 1
+    # The failed pack was still billed; its cost lands on the first fallback
+    single = results[1]["cost_usd"]
+    assert results[0]["cost_usd"] == pytest.approx(4 * single)
@@ -0,0 +1,79 @@
+import functools
+import importlib.util
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src import batch_runner
+from src.batch_runner import BatchError, read_requests
+from src.frame_dedup import FrameDeduper
+from src.results_log import ResultsLog, read_log
+from src.vision_analyzer import encode_frame
+
+
+def load_main():
+    spec = importlib.util.spec_from_file_location("analysis_main", Path(__file__).parent.parent / "analysis" / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def decoded_clips(n_clips, n_frames):
+    rng = np.random.default_rng(0)
+    for c in range(n_clips):
+        clip = {"__key__": f"clip_{c:02d}", "json": {"factory_id": 1, "worker_id": c, "duration_sec": 20}}
+        frames = [(10.0 * i, encode_frame(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)), 0)
+                  for i in range(n_frames)]
+        yield clip, frames
+
+
+def test_batch_ids_are_logged_as_submitted_and_failed_frames_retried(tmp_path, monkeypatch, fake_client):
+    main = load_main()
+    monkeypatch.setattr(batch_runner, "BatchWriter", functools.partial(batch_runner.BatchWriter, max_requests=2))
+    output = str(tmp_path / "run.jsonl")
+    plan, _ = main.prepare_batch(output, decoded_clips(2, 2), None, None, FrameDeduper(threshold=None))
+    assert len(plan["paths"]) == 2
+
+    batches = {}
+    crash_after = [1]
+
+    def submit(path):
+        if len(batches) == crash_after[0]:
+            raise ConnectionError("upload interrupted")
+        batch_id = f"batch_{len(batches)}"
+        batches[batch_id] = path
+        return batch_id
+
+    monkeypatch.setattr(batch_runner, "submit", submit)
+    with ResultsLog(output) as log:
+        with pytest.raises(ConnectionError):
+            main.submit_batches(plan, log)
+    # The first batch id reached the log before the crash
+    assert [r["batch_id"] for r in read_log(output) if r["type"] == "batch_submitted"] == ["batch_0"]
+
+    crash_after[0] = None
+    with ResultsLog(output) as log:
+        main.submit_batches(plan, log)
+        assert plan["batch_ids"] == ["batch_0", "batch_1"]  # only the unsubmitted file went out
+
+        def iter_results(batch):
+            all_ids = {f"clip_0{c}/{i}" for c in range(2) for i in range(2)}
+            for custom_id, _ in read_requests(batches[batch.id], all_ids):
+                if custom_id == "clip_01/1":
+                    yield custom_id, BatchError("500: mock server error")
+                else:
+                    yield custom_id, {"description": "from batch", "cost_usd": 0.0001, "tokens": 1,
+                                      "input_tokens": 1, "output_tokens": 0, "cached": False}
+
+        monkeypatch.setattr(batch_runner, "wait", lambda batch_id, on_poll=None: types.SimpleNamespace(
+            id=batch_id, status="completed", request_counts=None))
+        monkeypatch.setattr(batch_runner, "iter_results", iter_results)
+        analyzed, _ = main.collect_batch(plan, log, None, set())
+
+    assert analyzed == 2
+    records = {r["key"]: r for r in read_log(output) if r["type"] == "clip"}
+    assert [f["analysis"] for f in records["clip_01"]["frames"]] == ["from batch", "worker at a bench"]
+    assert len(fake_client) == 1  # only the failed frame was sent again
+    assert not any((tmp_path / path).exists() for path in plan["paths"])
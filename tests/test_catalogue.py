@@ -0,0 +1,28 @@
+from collections import Counter
+
+from src.catalogue import Catalogue
+
+
+def make_catalogue(path, clips_per_factory):
+    catalogue = Catalogue(path)
+    catalogue.update_shards((f"factory_{f:03d}/factory{f:03d}_worker001_part00.tar", 1, "v1")
+                            for f in clips_per_factory)
+    for shard in catalogue._conn().execute("SELECT * FROM shards").fetchall():
+        clips = [{"key": f"factory{shard['factory_id']:03d}_worker001_{i:05d}", "offset": i * 512, "size": 512,
+                  "metadata": {"factory_id": shard["factory_id"], "worker_id": 1}}
+                 for i in range(clips_per_factory[shard["factory_id"]])]
+        catalogue._add_clips(shard, {"clips": clips})
+    return catalogue
+
+
+def test_stratified_sample_gives_short_strata_quota_to_the_rest(tmp_path):
+    catalogue = make_catalogue(str(tmp_path / "catalogue.sqlite"), {1: 1, 2: 2, 3: 50, 4: 50})
+
+    sample = catalogue.sample(20, seed=0, stratify="factory")
+
+    assert len({clip["key"] for clip in sample}) == 20
+    counts = Counter(clip["factory_id"] for clip in sample)
+    assert (counts[1], counts[2]) == (1, 2)
+    assert sorted((counts[3], counts[4])) == [8, 9]
+    assert len(catalogue.sample(500, seed=0, stratify="factory")) == 103
+    assert catalogue.sample(20, seed=0, stratify="factory") == sample
@@ -0,0 +1,31 @@
+import os
+
+from benchmarks.synthetic_video import make_video
+from src import frame_store
+from src.decode_pool import DecodePool
+from src.frame_store import FrameStore
+
+
+def store_bytes(root):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(root) for name in names if name.endswith(".npy"))
+
+
+def test_frame_store_stays_under_its_cap_with_pool_workers(tmp_path):
+    # Each task's copy of the store sees fewer than EVICT_EVERY puts; only the pool sees them all
+    per_clip = frame_store.EVICT_EVERY // 2 + 1
+    clips = []
+    for i in range(3):
+        path = make_video(str(tmp_path / f"clip_{i}.mp4"), seconds=per_clip, width=64 + 16 * i, height=64, fps=5)
+        clips.append({"__key__": f"clip_{i}", "mp4": path})
+    frame_bytes = 64 * 64 * 3
+    store = FrameStore(str(tmp_path / "frames"), max_bytes=4 * frame_bytes)
+
+    with DecodePool(workers=2) as pool:
+        decoded = 0
+        for clip, frames in pool.imap(clips, interval_sec=1, max_frames=None, store=store):
+            decoded += len(frames)
+
+    assert decoded == 3 * per_clip > frame_store.EVICT_EVERY
+    assert store_bytes(store.root) <= store.max_bytes
+    assert store_bytes(store.root) > 0
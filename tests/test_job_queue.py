@@ -0,0 +1,93 @@
+import argparse
+import importlib.util
+import json
+import sqlite3
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic_video import make_video
+from src.frame_dedup import FrameDeduper
+from src.job_queue import JobQueue
+
+
+def load_main():
+    spec = importlib.util.spec_from_file_location("analysis_main", ROOT / "analysis" / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_clip(clips_dir, name, mp4=None):
+    meta = {"factory_id": 1, "worker_id": int(name[-1]), "duration_sec": 12}
+    (clips_dir / f"{name}.json").write_text(json.dumps(meta))
+    path = clips_dir / f"{name}.mp4"
+    if mp4 is None:
+        make_video(str(path), seconds=12, width=160, height=96, fps=10)
+    else:
+        path.write_bytes(mp4)
+
+
+def test_corrupt_clip_fails_only_its_own_job(tmp_path, fake_client):
+    clips_dir = tmp_path / "clips"
+    clips_dir.mkdir()
+    for i in range(4):
+        write_clip(clips_dir, f"clip_0{i}")
+    write_clip(clips_dir, "clip_04", mp4=b"not an mp4" * 100)
+
+    main = load_main()
+    main.QUEUE_POLL_SEC = 0
+    args = argparse.Namespace(
+        queue=str(tmp_path / "queue.sqlite"), enqueue=[str(clips_dir)], max_clips=10, stratify=None,
+        worker=True, output=str(tmp_path / "out.jsonl"), store=str(tmp_path / "results.sqlite"),
+    )
+    analyzed, cost, _, finished = main.run_queue(args, None, None, FrameDeduper())
+
+    assert finished
+    assert analyzed == 4
+    with sqlite3.connect(args.queue) as conn:
+        jobs = dict((job_id, (status, attempts)) for job_id, status, attempts in
+                    conn.execute("SELECT id, status, attempts FROM jobs"))
+    assert jobs.pop("clip_04") == ("failed", JobQueue(args.queue).max_attempts)
+    assert set(jobs.values()) == {("done", 1)}
+    # Two frames per 12 s clip, each analysed exactly once
+    assert len(fake_client) == 8
+    records = [json.loads(line) for line in open(args.output)]
+    assert sorted(r["key"] for r in records if r["type"] == "clip") == [f"clip_0{i}" for i in range(4)]
+
+
+def test_only_one_worker_finalizes_a_drained_queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    queue.add([("clip_00", {"path": "clip_00.mp4"})])
+    assert not queue.claim_finalize("a")  # not drained yet
+
+    job_id, _, _ = queue.claim("a")
+    queue.complete(job_id, "a", {"key": job_id})
+    other = JobQueue(queue.path)
+    assert [queue.claim_finalize("a"), other.claim_finalize("b"), queue.claim_finalize("a")] == [True, False, False]
+
+
+def test_cross_clip_duplicates_resolve_across_worker_rounds(tmp_path, fake_client):
+    from src.decode_pool import DecodePool
+
+    clips_dir = tmp_path / "clips"
+    clips_dir.mkdir()
+    write_clip(clips_dir, "clip_01")
+    (clips_dir / "clip_02.mp4").write_bytes((clips_dir / "clip_01.mp4").read_bytes())
+    (clips_dir / "clip_02.json").write_text((clips_dir / "clip_01.json").read_text())
+    main = load_main()
+    clips = {clip["__key__"]: clip for clip in main.local_clips(str(clips_dir))}
+    records = []
+    log = types.SimpleNamespace(write=records.append)
+    deduper = FrameDeduper(cross_clip=True)
+    submitted = {}
+    with DecodePool(workers=1) as decoder:
+        for key in ("clip_01", "clip_02"):  # one clip per round, as a worker claims them
+            main.run_sync(iter([clips[key]]), log, None, None, deduper, None, decoder=decoder, submitted=submitted)
+
+    assert [r["key"] for r in records] == ["clip_01", "clip_02"]
+    assert all("deduped_from" in frame for frame in records[1]["frames"])
+    assert len(fake_client) == 2
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import Future
+
+from benchmarks.synthetic_video import make_video
+from src.live_feed import FrameRing, LiveFeed
+
+
+def test_ring_keeps_only_the_newest_frames():
+    ring = FrameRing(capacity=3)
+    for seq in range(5):
+        ring.put({"seq": seq})
+    assert [item["seq"] for item in ring._items] == [2, 3, 4]
+    assert ring.latest()["seq"] == 4
+    ring.close()
+    assert ring.latest(after_seq=4) is None  # closed, nothing newer
+    assert ring.latest(after_seq=3)["seq"] == 4
+
+
+class SlowEngine:
+    """Answers each frame after `delay` seconds and records how many were in flight at once."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def submit_many(self, frames, prompt, encoded=False):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future = Future()
+
+        def finish():
+            with self._lock:
+                self.in_flight -= 1
+            future.set_result({"description": "worker at a bench", "cost_usd": 0.0})
+
+        threading.Timer(self.delay, finish).start()
+        return [future]
+
+
+def test_live_feed_caps_requests_in_flight_and_drops_stale_frames(tmp_path):
+    path = make_video(str(tmp_path / "feed.mp4"), seconds=4, width=96, height=64, fps=20)
+    engine = SlowEngine(delay=0.05)
+    feed = LiveFeed(path, engine, sample_fps=10, ring_size=2, max_in_flight=2, realtime=False)
+    decisions = []
+
+    stats = feed.run(decisions.append)
+
+    assert feed.capture_error is None
+    assert engine.max_in_flight == 2
+    assert stats["frames_sampled"] == 40
+    assert stats["analyzed"] == len(decisions) > 0
+    assert stats["dropped"] > 0  # decoding outpaces the analysis, so stale frames are skipped
+    assert stats["analyzed"] + stats["dropped"] == stats["frames_sampled"]
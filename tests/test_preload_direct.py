@@ -0,0 +1,34 @@
+import os
+import random
+
+import pytest
+
+from preload_clips_direct import download_and_extract
+from tests.test_shard_index import make_tar
+
+
+def test_interrupted_download_resumes_with_range(range_server, tmp_path):
+    base_url, server = range_server
+    rng = random.Random(1)
+    clips = {f"clip_{i:02d}": ({"factory_id": 1, "worker_id": i}, rng.randbytes(200_000)) for i in range(3)}
+    make_tar(os.path.join(server.root, "shard.tar"), clips)
+    dest = str(tmp_path / "out")
+
+    server.cut_after = 300_000
+    with pytest.raises(Exception):
+        download_and_extract(f"{base_url}/shard.tar", dest, {})
+    partial = os.path.getsize(dest + ".part")
+    assert 0 < partial <= 300_000
+
+    server.cut_after = None
+    server.requests.clear()
+    extracted = download_and_extract(f"{base_url}/shard.tar", dest, {})
+
+    assert server.requests == [("GET", "/shard.tar", f"bytes={partial}-")]
+    assert not os.path.exists(dest + ".part")
+    assert len(extracted) == len(clips)
+    for path, meta in extracted:
+        key = os.path.basename(path)[:-len(".mp4")]
+        assert meta == clips[key][0]
+        with open(path, "rb") as f:
+            assert f.read() == clips[key][1]
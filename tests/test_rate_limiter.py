@@ -0,0 +1,45 @@
+import time
+import types
+
+import pytest
+
+from src.analysis_engine import _retry_after
+from src.rate_limiter import RateLimiter, TokenBucket
+
+
+def timed(fn, *args):
+    start = time.monotonic()
+    fn(*args)
+    return time.monotonic() - start
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(per_minute=1200, capacity=2)  # 20 tokens/s
+    assert timed(bucket.acquire, 2) < 0.02  # starts full
+    assert 0.03 < timed(bucket.acquire, 1) < 0.2  # one token takes 50 ms to come back
+
+
+def test_token_bucket_carries_underestimates_as_debt():
+    bucket = TokenBucket(per_minute=1200, capacity=4)
+    bucket.acquire(1)
+    bucket.adjust(5)  # the request really used 6 tokens
+    assert 0.15 < timed(bucket.acquire, 1) < 0.5  # 2 tokens of debt plus 1 to pay back first
+
+
+def test_pause_holds_every_caller_until_retry_after():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=10 ** 6)
+    limiter.pause(0.2)
+    limiter.pause(0.05)  # a shorter pause never cuts an earlier one short
+    assert 0.18 < timed(limiter.acquire, 100) < 0.5
+    assert timed(limiter.acquire, 100) < 0.02
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, None),
+    ({}, None),
+])
+def test_retry_after_header(headers, expected):
+    error = types.SimpleNamespace(response=types.SimpleNamespace(headers=headers))
+    assert _retry_after(error) == expected
@@ -0,0 +1,42 @@
+import time
+
+from src import response_cache
+from src.response_cache import ResponseCache, cache_key
+
+
+def test_cache_key_covers_image_prompt_and_model_params():
+    base = cache_key("abc", "Describe.", model="m", max_tokens=100, detail="low")
+    assert cache_key("abc", "Describe.", model="m", max_tokens=100, detail="low") == base
+    variants = [
+        cache_key("abd", "Describe.", model="m", max_tokens=100, detail="low"),
+        cache_key("abc", "Describe!", model="m", max_tokens=100, detail="low"),
+        cache_key("abc", "Describe.", model="m2", max_tokens=100, detail="low"),
+        cache_key("abc", "Describe.", model="m", max_tokens=200, detail="low"),
+        cache_key("abc", "Describe.", model="m", max_tokens=100, detail="high"),
+    ]
+    assert len({base, *variants}) == 6
+    # Parts are delimited, so moving text between them changes the key
+    assert cache_key("c", "Describe.ab", model="m", max_tokens=100, detail="low") != base
+
+
+def test_hit_is_free_and_marked_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert cache.get("k") is None
+    cache.put("k", {"description": "worker", "cost_usd": 0.001, "cached": False})
+    assert cache.get("k") == {"description": "worker", "cost_usd": 0.0, "cached": True}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_expired_then_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "EVICT_EVERY", 10 ** 9)  # sweep only when asked
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2, max_age_days=1)
+    now = time.time()
+    clock = iter([now - 2 * 86400, now - 30, now - 20, now - 10])
+    monkeypatch.setattr(response_cache.time, "time", lambda: next(clock, now))
+    for key in ("old", "a", "b", "c"):
+        cache.put(key, {"description": key})
+    cache.get("a")  # now the most recently used
+
+    cache.evict()
+
+    assert [key for key in ("old", "a", "b", "c") if cache.get(key) is not None] == ["a", "c"]
@@ -0,0 +1,53 @@
+import io
+import json
+import os
+import random
+import tarfile
+
+from src.shard_index import RangeFile, build_index, fetch_clip, HEADER_READ_SIZE
+
+
+def make_tar(path, clips):
+    with tarfile.open(path, "w", format=tarfile.PAX_FORMAT) as tar:
+        for key, (meta, mp4) in clips.items():
+            for ext, data in (("json", json.dumps(meta).encode()), ("mp4", mp4)):
+                info = tarfile.TarInfo(f"{key}.{ext}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+
+def test_index_and_fetch_across_block_boundaries(range_server):
+    base_url, server = range_server
+    rng = random.Random(0)
+    clips = {
+        # Metadata bigger than one header read, so it spans two blocks
+        "factory001_worker001_00000": ({"factory_id": 1, "notes": "x" * (HEADER_READ_SIZE + 3000)},
+                                       rng.randbytes(HEADER_READ_SIZE * 2 + 17)),
+        # A name too long for a ustar header needs a pax header first
+        "f" * 150: ({"factory_id": 2, "worker_id": 7}, rng.randbytes(5000)),
+        "factory001_worker002_00001": ({"factory_id": 1, "worker_id": 2}, rng.randbytes(HEADER_READ_SIZE - 300)),
+    }
+    make_tar(os.path.join(server.root, "shard.tar"), clips)
+    url = f"{base_url}/shard.tar"
+
+    index = build_index(url)
+    assert [clip["key"] for clip in index["clips"]] == list(clips)
+    for clip in index["clips"]:
+        meta, mp4 = clips[clip["key"]]
+        assert clip["metadata"] == meta
+        assert clip["size"] == len(mp4)
+        assert fetch_clip(url, clip) == mp4
+
+
+def test_range_file_reads_span_blocks(range_server):
+    base_url, server = range_server
+    data = bytes(range(256)) * 40
+    with open(os.path.join(server.root, "blob.bin"), "wb") as f:
+        f.write(data)
+
+    remote = RangeFile(f"{base_url}/blob.bin", block_size=1000)
+    remote.seek(900)
+    assert remote.read(2500) == data[900:3400]
+    remote.seek(-100, io.SEEK_END)
+    assert remote.read(1000) == data[-100:]
+    assert remote.read(10) == b""
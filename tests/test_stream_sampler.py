@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks.synthetic_video import make_video
+from src.stream_sampler import extract_frames, sample_key
+
+
+def test_sample_key_without_webdataset_key_uses_mp4_content():
+    meta = {"factory_id": 1, "worker_id": 2, "duration_sec": 60.0}
+    a = {"json": meta, "mp4": b"first clip"}
+    b = {"json": dict(meta), "mp4": b"second clip"}
+
+    assert sample_key(a) != sample_key(b)
+    assert sample_key({"json": meta, "mp4": b"first clip"}) == sample_key(a)
+    del a["mp4"]  # the key outlives the MP4, e.g. after DecodePool hands it to a worker
+    assert sample_key(a) == sample_key({"json": meta, "mp4": b"first clip"})
+    assert sample_key({"__key__": "factory001_worker002_00003", "json": meta}) == "factory001_worker002_00003"
+
+
+def test_extract_frames_returns_real_pts_and_stops_past_the_end(tmp_path):
+    path = make_video(str(tmp_path / "clip.mp4"), seconds=6, width=96, height=64, fps=10)
+
+    frames = extract_frames(path, timestamps=[0, 2.55, 4, 30, 5])
+
+    # 30 s lies past the end of the 6 s clip; 5 s sorts before it and is kept
+    assert len(frames) == 4
+    secs = [sec for sec, _ in frames]
+    assert secs[0] == 0.0
+    assert secs[1] == pytest.approx(2.6)  # the first frame at or after 2.55 s, at its own pts
+    assert secs[2:] == [pytest.approx(4.0), pytest.approx(5.0)]
+    assert all(frame.shape == (64, 96, 3) for _, frame in frames)
+
+    every_2s = extract_frames(path, interval_sec=2, max_frames=None)
+    assert [sec for sec, _ in every_2s] == [pytest.approx(t) for t in (0, 2, 4)]